@@ -0,0 +1,97 @@
+import threading
+from langchain_core.messages import HumanMessage
+
+# ==========================================
+# 规则快速路由：意图明确时直接分派，不花一次 LLM 调用
+# ==========================================
+
+# 链上操作类关键词 -> 交易执行官
+EXECUTOR_KEYWORDS = (
+    "余额", "balance", "授权", "approve", "存入", "存款", "存钱", "deposit",
+    "wrap", "包装", "兑换成weth", "换成weth", "换成 weth",
+    "持仓", "仓位", "portfolio", "allowance", "授权额度",
+    "交易状态", "上链", "确认了吗", "交易哈希",
+)
+# 信息查询类关键词 -> 市场分析师
+ANALYST_KEYWORDS = (
+    "价格", "币价", "多少钱", "行情", "price", "新闻", "news",
+    "研报", "白皮书", "知识库", "whitepaper", "无常损失", "集中流动性",
+    "走势", "什么是", "解释", "原理", "机制", "explain",
+)
+# "消息"、"分析" 这类泛用词不放进来："帮我分析一下然后存 0.01 WETH" 其实是要交易，应交给 LLM 判断
+# 子 Agent 回复时带的身份标签
+AGENT_TAGS = {"analyst": "【市场分析师】", "executor": "【交易执行官】"}
+
+
+def _content(msg):
+    return msg.content if isinstance(msg.content, str) else str(msg.content)
+
+
+def classify_intents(text):
+    """返回文本命中的意图集合 (analyst / executor)"""
+    text = text.lower()
+    intents = set()
+    if any(k in text for k in EXECUTOR_KEYWORDS):
+        intents.add("executor")
+    if any(k in text for k in ANALYST_KEYWORDS):
+        intents.add("analyst")
+    return intents
+
+
+def fast_route(messages):
+    """
+    返回 "analyst" / "executor" / "FINISH"；拿不准时返回 None，交给 LLM 经理判断。
+    """
+    if not messages:
+        return None
+    last = messages[-1]
+    last_text = _content(last)
+
+    # 1. 已经唤起钱包，必须立刻结束
+    if '"type": "transaction"' in last_text:
+        return "FINISH"
+
+    user_msg = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+    if user_msg is None:
+        return None
+    intents = classify_intents(_content(user_msg))
+    # 同时命中两类 (如 "先查价格再存钱") 或都没命中：交给 LLM
+    if len(intents) != 1:
+        return None
+    intent = next(iter(intents))
+
+    # 2. 用户刚发言，意图单一 -> 直接分派
+    if last is user_msg:
+        return intent
+
+    # 3. 单一意图且对应的子 Agent 已经回复 -> 结束
+    if last_text.startswith(AGENT_TAGS[intent]):
+        return "FINISH"
+    return None
+
+
+class RouterStats:
+    """统计快速路由的命中率"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def snapshot(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 4)}
+
+
+router_stats = RouterStats()
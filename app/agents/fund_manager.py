@@ -1,22 +1,34 @@
 import os
 import operator
+from functools import partial
 from typing import Annotated, Sequence, TypedDict, Literal
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
 from langchain.agents import create_agent
-from langgraph.checkpoint.memory import MemorySaver
+from langchain.agents.middleware import dynamic_prompt
 from pydantic import BaseModel, Field
+from config import settings
 
 # 导入所有工具
 from app.tools.aave_tool import deposit_weth_to_aave
 from app.tools.balance_tool import get_balance
+from app.tools.portfolio_tool import get_portfolio_snapshot
 from app.tools.swap_tool import swap_eth_to_weth
+from app.tools.tx_status_tool import get_transaction_status
 from app.tools.market_tool import get_token_price
 from app.tools.approve_tool import approve_weth_to_aave
 from app.tools.news_tool import get_crypto_news
 from app.tools.rag_tool import query_knowledge_base
-from app.tools.pearson_recent_match import get_rag_inform
+from app.tools.pearson_recent_match import analog_refresher
+from app.utils.session_store import SessionRegistry
+from app.utils.chain_state import chain_state
+from app.utils.response_cache import analyst_cache
+from app.utils.checkpoint_store import create_checkpointer
+from app.utils.metrics import TracingCallback, current_trace, traced
+from app.agents.fast_router import fast_route, router_stats
+from app.agents.tool_timeout import ToolTimeoutMiddleware
 
 import warnings
 # 屏蔽 Pydantic 底层无害的序列化警告，让控制台保持清爽
@@ -28,6 +40,8 @@ warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
     next_agent: str
+    summary: str            # 早前对话的滚动摘要 (只增量更新，不重复总结)
+    summarized_count: int   # 已经并入摘要的消息条数
 
 # ==========================================
 # 2. 初始化 LLM 与 子 Agent
@@ -37,21 +51,27 @@ llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key=os.getenv("OPENAI_API_KE
 
 # 👱‍♂️ 市场分析师 (查新闻 + 读研报)
 analyst_tools = [get_token_price, get_crypto_news, query_knowledge_base]
-rag_corr, rag_first, rag_last = get_rag_inform()
-analyst_agent = create_agent(
-    model=llm, 
-    tools=analyst_tools, 
-    system_prompt="你是顶级的加密市场分析师。你可以查询实时新闻。在解答深度问题时，请务必先调用知识库 (query_knowledge_base) 检索 a16z 研报或 Uniswap 白皮书等专业资料,"
-                  f"并请参考以下数据：过去某段时间5天内ETH价格变化趋势与近5天内ETH价格趋势极其相似，前者5天的价格变动分别为{rag_first},在这之后的5天里ETH的价格为{rag_last}。"
-                  "请参照以上信息，用通俗易懂的语言，基于知识库的内容给出极其专业的分析。"
-)
+
+@dynamic_prompt
+def analyst_prompt(request):
+    """每次调用时读取后台刷新的 ETH 相似走势，而不是启动时固化在提示词里"""
+    prompt = "你是顶级的加密市场分析师。你可以查询实时新闻。在解答深度问题时，请务必先调用知识库 (query_knowledge_base) 检索 a16z 研报或 Uniswap 白皮书等专业资料,"
+    matches = analog_refresher.latest()
+    if matches:
+        probe_days, horizon_days = settings.ANALOG_PROBE_LEN, settings.ANALOG_HORIZON
+        prompt += f"并请参考以下数据：历史上有 {len(matches)} 段时间的{probe_days}天ETH价格变化趋势与近{probe_days}天内ETH价格趋势极其相似 (按相似度从高到低)："
+        for i, match in enumerate(matches, start=1):
+            prompt += f"第{i}段 (相关系数 {match.corr:.2f}) 前{probe_days}天的价格变动分别为{match.first},在这之后的{horizon_days}天里ETH的价格为{match.last}；"
+        prompt += "请综合这几段历史的后续走势，不要只看其中一段。"
+    prompt += "需要的价格、新闻、知识库查询互不依赖时，请在同一步里一次性发起全部工具调用 (它们会并发执行)，不要一个一个地查。"
+    return prompt + "请参照以上信息，用通俗易懂的语言，基于知识库的内容给出极其专业的分析。"
+
 # 👷 交易执行官 (只负责干活)
-executor_tools = [deposit_weth_to_aave, get_balance, swap_eth_to_weth, approve_weth_to_aave]
-executor_agent = create_agent(
-    model=llm, 
-    tools=executor_tools, 
-    system_prompt="""你是精准的交易执行官。你的唯一任务是调用工具执行区块链操作。
+executor_tools = [deposit_weth_to_aave, get_balance, get_portfolio_snapshot, swap_eth_to_weth, approve_weth_to_aave, get_transaction_status]
+EXECUTOR_PROMPT = """你是精准的交易执行官。你的唯一任务是调用工具执行区块链操作。
     【业务纪律】：在向 Aave 存款 (Deposit) 之前，必须先确认是否已经调用了授权 (Approve) 工具。
+    需要判断余额是否足够、是否已经授权时，先调用 get_portfolio_snapshot (一次查全 ETH/WETH 余额、授权额度、Aave 仓位)；快照显示已授权就直接存款，不要重复 Approve。
+    兑换 (swap) 交易提交后会立即返回交易哈希，不会等待上链；用户问交易是否完成时调用 get_transaction_status 查询，不要重复提交同一笔兑换。
     
     ⚠️【最高指令】（生死攸关，前端系统极其脆弱）：
     1. 必须保留包装盒：工具返回的 JSON 包含了非常关键的 `{"type": "transaction", ...}` 外层结构！你必须【连同外层结构】一起完整输出！绝对禁止只提取内部的 to、data 字段！
@@ -59,32 +79,125 @@ executor_agent = create_agent(
     3. 正确的输出格式范例：
        请先确认授权... {"type": "transaction", "tx_data": {"to": "...", "data": "...", "value": "..."}}
     4. 🛑 防冲突：一次回复只允许输出一个完整 JSON。如果需要先授权，请只输出 Approve 的 JSON，并提示用户等待上链。"""
-)
 # ==========================================
-# 3. 定义节点逻辑 (封装子 Agent)
+# 3. 对话历史压缩 (滑动窗口 + 滚动摘要)
+# ==========================================
+def _window_start(messages, token_budget=None, max_turns=None):
+    """
+    从后往前数，找到近期窗口的起点下标：
+    最多保留 max_turns 轮对话，且总 token 不超过 token_budget (最后一条消息无论多长都保留)。
+    """
+    token_budget = token_budget or settings.HISTORY_TOKEN_BUDGET
+    max_turns = max_turns or settings.HISTORY_WINDOW_TURNS
+    start = len(messages)
+    used = 0
+    turns = 0
+    for idx in range(len(messages) - 1, -1, -1):
+        used += count_tokens_approximately([messages[idx]])
+        if used > token_budget and start < len(messages):
+            break
+        start = idx
+        if isinstance(messages[idx], HumanMessage):
+            turns += 1
+            if turns >= max_turns:
+                break
+    return start
+
+
+def _recent_messages(state: AgentState):
+    """
+    还没并入摘要的近期消息。
+    窗口起点在每轮开始时由 compact_node 定下 (summarized_count)，轮内各节点不再重新计算：
+    否则子 Agent 追加的消息会把窗口往后推，还没总结的旧消息就被直接丢掉了
+    """
+    return list(state["messages"][state.get("summarized_count", 0):])
+
+
+def _context_messages(state: AgentState):
+    """发给子 Agent 的上下文：摘要 + 近期消息"""
+    recent = _recent_messages(state)
+    summary = state.get("summary")
+    if summary:
+        return [SystemMessage(content=f"【早前对话摘要】{summary}")] + recent
+    return recent
+
+
+@traced("node", "compact")
+def compact_node(state: AgentState, model=None):
+    """
+    每轮对话开始时执行一次：把滑出窗口的旧消息增量并入滚动摘要。
+    已经总结过的消息不会再次发送给 LLM。
+    """
+    messages = state["messages"]
+    done = state.get("summarized_count", 0)
+    keep_from = done + _window_start(messages[done:])
+    if keep_from <= done:
+        return {}
+
+    print(f"🗜️ [记忆压缩] 正在把 {keep_from - done} 条旧消息并入摘要...")
+    transcript = "\n".join(f"{m.type}: {m.content}" for m in messages[done:keep_from])
+    prompt = f"""请把下面的新对话内容合并进已有摘要，输出一段新的中文摘要（不超过 300 字）。
+    只保留对后续对话有用的信息：用户的目标与偏好、已查询到的关键数据、已发起或完成的链上操作。
+
+    已有摘要: {state.get("summary") or "无"}
+
+    新对话内容:
+    {transcript}"""
+    summary = (model or llm).invoke(prompt).content
+    return {"summary": summary, "summarized_count": keep_from}
+
+# ==========================================
+# 4. 定义节点逻辑 (封装子 Agent)
 # ==========================================
-def analyst_node(state: AgentState):
+# 回答依赖这些实时工具时只短暂缓存 (ANSWER_CACHE_VOLATILE_TTL)
+VOLATILE_TOOLS = {"get_token_price", "get_crypto_news"}
+
+@traced("node", "analyst")
+def analyst_node(state: AgentState, agent, cache=None):
     print(" [经理路由] 任务交给了 ->  市场分析师")
-    result = analyst_agent.invoke({"messages": state["messages"]})
+    # 只有用户刚提出的、不依赖上下文的问题才查 / 写语义缓存
+    last = state["messages"][-1]
+    question = last.content if isinstance(last, HumanMessage) and isinstance(last.content, str) else None
+    use_cache = cache is not None and question is not None and cache.cacheable(question)
+    if use_cache:
+        answer = cache.lookup(question)
+        if answer is not None:
+            print(f"⚡ [回复缓存] 命中，跳过 LLM (命中率 {cache.hit_rate:.0%})")
+            return {"messages": [AIMessage(content=f"【市场分析师】: {answer}")]}
+
+    result = agent.invoke({"messages": _context_messages(state)})
+    answer = result['messages'][-1].content
+    if use_cache:
+        used_tools = {m.name for m in result["messages"] if isinstance(m, ToolMessage)}
+        cache.store(question, answer, settings.ANSWER_CACHE_VOLATILE_TTL if used_tools & VOLATILE_TOOLS else None)
     # 在回复前加上身份标签
-    msg = AIMessage(content=f"【市场分析师】: {result['messages'][-1].content}")
+    msg = AIMessage(content=f"【市场分析师】: {answer}")
     return {"messages": [msg]}
 
-def executor_node(state: AgentState):
+@traced("node", "executor")
+def executor_node(state: AgentState, agent):
     print(" [经理路由] 任务交给了 ->  交易执行官")
-    result = executor_agent.invoke({"messages": state["messages"]})
+    result = agent.invoke({"messages": _context_messages(state)})
     msg = AIMessage(content=f"【交易执行官】: {result['messages'][-1].content}")
     return {"messages": [msg]}
 
 # ==========================================
-# 4. 定义大堂经理 (Supervisor 路由判断)
+# 5. 定义大堂经理 (Supervisor 路由判断)
 # ==========================================
 class Router(BaseModel):
     next_agent: Literal["analyst", "executor", "FINISH"] = Field(
         description="决定下一个任务的角色：查行情、看新闻、查询知识库、解释DeFi专业概念请选 analyst；查余额、授权、转账请选 executor；如果是打招呼等纯日常寒暄，选 FINISH。"
     )
 
-def supervisor_node(state: AgentState):
+@traced("node", "supervisor")
+def supervisor_node(state: AgentState, model=None):
+    # 先走规则快速路由，意图明确时不调用 LLM
+    fast_decision = fast_route(state["messages"])
+    router_stats.record(fast_decision is not None)
+    if fast_decision:
+        print(f"⚡ [快速路由] -> {fast_decision} (命中率 {router_stats.hit_rate:.0%})")
+        return {"next_agent": fast_decision}
+
     print("🧠 [大堂经理] 正在思考该安排谁...")
     prompt = f"""你是一个 DeFi 系统的总管经理。负责将任务分配给【市场分析师(analyst)】或【交易执行官(executor)】，或选择结束(FINISH)。
     
@@ -97,75 +210,207 @@ def supervisor_node(state: AgentState):
        - 只有当用户明确要求“先查信息，后操作钱包”时，你才可以在 analyst 回复后，将任务接力传给 executor。
     4. 🕰️【无视历史】：只针对用户的最新指令做出判断，忽略之前回合留下的 JSON 或总结。
     
-    当前对话记录: {state['messages']}"""
+    早前对话摘要: {state.get('summary') or '无'}
+    当前对话记录: {_recent_messages(state)}"""
     
-    router_llm = llm.with_structured_output(Router)
+    router_llm = (model or llm).with_structured_output(Router)
     decision = router_llm.invoke(prompt)
     return {"next_agent": decision.next_agent}
 # ==========================================
-# 5. 构建 LangGraph 工作流
+# 6. 构建 LangGraph 工作流
 # ==========================================
-workflow = StateGraph(AgentState)
-workflow.add_node("supervisor", supervisor_node)
-workflow.add_node("analyst", analyst_node)
-workflow.add_node("executor", executor_node)
-
-workflow.add_edge(START, "supervisor")
-
-# 经理决定流程走向
-workflow.add_conditional_edges(
-    "supervisor",
-    lambda state: state["next_agent"],
-    {
-        "analyst": "analyst",
-        "executor": "executor",
-        "FINISH": END
-    }
-)
-
-# 子 Agent 干完活后，必须向经理汇报
-workflow.add_edge("analyst", "supervisor")
-workflow.add_edge("executor", "supervisor")
-
-# 添加记忆持久化（确保它能记住之前的对话）
-memory = MemorySaver()
-app_graph = workflow.compile(checkpointer=memory)
+def build_app_graph(model=None, tools=None, checkpointer=None, answer_cache=analyst_cache):
+    """
+    构建多 Agent 工作流。默认使用 GPT-4o 与真实工具；
+    tools 形如 {"analyst": [...], "executor": [...]}，基准测试可以注入假模型与本地桩工具。
+    answer_cache 为分析师回复的语义缓存，传 None 则关闭。
+    """
+    model = model or llm
+    tools = {"analyst": analyst_tools, "executor": executor_tools, **(tools or {})}
+    analyst_agent = create_agent(
+        model=model, 
+        tools=tools["analyst"], 
+        # 同一步的工具调用并发执行，单个工具超时不拖住整轮
+        middleware=[analyst_prompt, ToolTimeoutMiddleware()],
+    )
+    executor_agent = create_agent(
+        model=model, 
+        tools=tools["executor"], 
+        system_prompt=EXECUTOR_PROMPT,
+    )
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("compact", partial(compact_node, model=model))
+    workflow.add_node("supervisor", partial(supervisor_node, model=model))
+    workflow.add_node("analyst", partial(analyst_node, agent=analyst_agent, cache=answer_cache))
+    workflow.add_node("executor", partial(executor_node, agent=executor_agent))
+
+    # 每轮先压缩历史，再交给经理
+    workflow.add_edge(START, "compact")
+    workflow.add_edge("compact", "supervisor")
+
+    # 经理决定流程走向
+    workflow.add_conditional_edges(
+        "supervisor",
+        lambda state: state["next_agent"],
+        {
+            "analyst": "analyst",
+            "executor": "executor",
+            "FINISH": END
+        }
+    )
+
+    # 子 Agent 干完活后，必须向经理汇报
+    workflow.add_edge("analyst", "supervisor")
+    workflow.add_edge("executor", "supervisor")
+
+    return workflow.compile(checkpointer=checkpointer)
+
+# 添加记忆持久化（确保它能记住之前的对话）；默认落盘到 SQLite，见 settings.CHECKPOINT_BACKEND
+memory = create_checkpointer()
+app_graph = build_app_graph(checkpointer=memory)
 
 # ==========================================
-# 6. 兼容现有 server.py 的包装器 (增强版)
+# 7. 兼容现有 server.py 的包装器 (增强版)
 # ==========================================
+GREETING = "【大堂经理】：您好！我是 DeFi 智能理财管家。我可以帮您解答专业知识（如Uniswap/Aave机制）、查询行情、或者执行链上交易。请问有什么可以帮您？"
+
+
+def _collect_response(event, final_responses):
+    """从一次 stream 事件里收集分析师 / 执行官的汇报"""
+    for node_name, node_state in event.items():
+        # 只要是分析师或执行官的汇报，我们就记录下来
+        if node_name in ["analyst", "executor"]:
+            latest_msg = node_state["messages"][-1].content
+            final_responses.append(latest_msg)
+
+
+def _token_event(namespace, chunk):
+    """把子 Agent 内部 LLM 产生的 token 转成流式事件；经理路由、记忆压缩等内部调用不外推"""
+    msg, _metadata = chunk
+    agent = namespace[0].split(":")[0] if namespace else None
+    if agent not in ["analyst", "executor"] or not isinstance(msg, AIMessage):
+        return None
+    if not isinstance(msg.content, str) or not msg.content:
+        return None
+    return {"type": "token", "agent": agent, "content": msg.content}
+
+
+def _finish_output(result):
+    """没有触发任何子 Agent（直接走到了 FINISH）时的兜底回复"""
+    last_msg = result["messages"][-1]
+    # 防复读机机制：如果最后一条还是用户自己的话，说明 AI 没说话
+    if isinstance(last_msg, HumanMessage):
+        return GREETING
+    return last_msg.content
+
+
 class MultiAgentWrapper:
+    def __init__(self, graph=None):
+        self.graph = graph or app_graph
+        # 每个会话一条独立的记忆线程，会话被回收时顺便清掉它的历史
+        # 落盘的检查点存储 (多个 worker 共用) 按数据库里的活跃时间自行回收，进程内的登记表不能删共享的历史
+        checkpointer = self.graph.checkpointer
+        on_evict = None if getattr(checkpointer, "manages_eviction", False) else checkpointer.delete_thread
+        self.sessions = SessionRegistry(on_evict=on_evict)
+
+    def _session_config(self, inputs):
+        session_id = self.sessions.touch(inputs.get("session_id"))
+        # 回调记录图里每次 LLM / 工具调用的耗时，挂到当前请求的追踪上
+        return session_id, {"configurable": {"thread_id": session_id}, "callbacks": [TracingCallback(current_trace())]}
+
     def invoke(self, inputs):
         user_input = inputs["input"]
-        config = {"configurable": {"thread_id": "user_1"}} # 设定用户记忆 ID
+        session_id, config = self._session_config(inputs) # 设定用户记忆 ID
         
         # 使用 stream() 替代 invoke()，这样我们能捕获每一个子 Agent 的工作成果
+        # 同时订阅 values，拿到最终状态，整个请求只跑一遍图
         final_responses = []
+        final_state = None
         
         # 遍历整个图的执行流
-        for event in app_graph.stream({"messages": [HumanMessage(content=user_input)]}, config=config):
-            for node_name, node_state in event.items():
-                # 只要是分析师或执行官的汇报，我们就记录下来
-                if node_name in ["analyst", "executor"]:
-                    latest_msg = node_state["messages"][-1].content
-                    final_responses.append(latest_msg)
+        for mode, chunk in self.graph.stream(
+            {"messages": [HumanMessage(content=user_input)]}, config=config, stream_mode=["updates", "values"]
+        ):
+            if mode == "values":
+                final_state = chunk
+            else:
+                _collect_response(chunk, final_responses)
         
         # 把所有 Agent 的汇报用换行符拼合在一起
         if final_responses:
             combined_output = "\n\n".join(final_responses)
         else:
-            # 如果没有触发任何子 Agent（直接走到了 FINISH）
-            result = app_graph.invoke({"messages": [HumanMessage(content=user_input)]}, config=config)
-            last_msg = result["messages"][-1]
+            combined_output = _finish_output(final_state)
             
-            # 防复读机机制：如果最后一条还是用户自己的话，说明 AI 没说话
-            if isinstance(last_msg, HumanMessage):
-                combined_output = "【大堂经理】：您好！我是 DeFi 智能理财管家。我可以帮您解答专业知识（如Uniswap/Aave机制）、查询行情、或者执行链上交易。请问有什么可以帮您？"
+        return {"output": combined_output, "session_id": session_id}
+
+    async def ainvoke(self, inputs):
+        """异步版本：供 server.py 在事件循环里调用，不阻塞其它请求"""
+        user_input = inputs["input"]
+        session_id, config = self._session_config(inputs)
+
+        final_responses = []
+        final_state = None
+        async for mode, chunk in self.graph.astream(
+            {"messages": [HumanMessage(content=user_input)]}, config=config, stream_mode=["updates", "values"]
+        ):
+            if mode == "values":
+                final_state = chunk
             else:
-                combined_output = last_msg.content
-            
-        return {"output": combined_output}
+                _collect_response(chunk, final_responses)
+
+        if final_responses:
+            combined_output = "\n\n".join(final_responses)
+        else:
+            combined_output = _finish_output(final_state)
+
+        return {"output": combined_output, "session_id": session_id}
+
+    async def astream(self, inputs):
+        """
+        流式版本：每个节点跑完、每个 token 生成时立即产出一个事件，供 /chat/stream (SSE) 使用。
+        事件类型: route (经理分派) / token (子 Agent 输出片段) / agent (子 Agent 完整汇报) / done (最终结果)
+        """
+        user_input = inputs["input"]
+        session_id, config = self._session_config(inputs)
+
+        final_responses = []
+        async for namespace, mode, chunk in self.graph.astream(
+            {"messages": [HumanMessage(content=user_input)]},
+            config=config,
+            stream_mode=["updates", "messages"],
+            subgraphs=True,  # 这样才能拿到子 Agent 内部 LLM 的 token
+        ):
+            if mode == "messages":
+                event = _token_event(namespace, chunk)
+                if event:
+                    yield event
+                continue
+            # 子 Agent 内部的节点更新不往外推，只看顶层图
+            if namespace:
+                continue
+            for node_name, node_state in chunk.items():
+                if node_name == "supervisor":
+                    yield {"type": "route", "agent": node_state["next_agent"]}
+                elif node_name in ["analyst", "executor"]:
+                    content = node_state["messages"][-1].content
+                    final_responses.append(content)
+                    yield {"type": "agent", "agent": node_name, "content": content}
+
+        if final_responses:
+            combined_output = "\n\n".join(final_responses)
+        else:
+            # 直接走到 FINISH：从检查点读取最终状态，不再重新跑一遍图
+            snapshot = await self.graph.aget_state(config)
+            combined_output = _finish_output(snapshot.values)
+
+        yield {"type": "done", "answer": combined_output, "session_id": session_id}
 
 def create_fund_manager():
     print("🚀 正在启动多智能体系统 (Manager -> Analyst & Executor)...")
+    # ETH 相似走势在后台计算并定时刷新，启动时不访问网络
+    analog_refresher.start()
+    # 后台轮询最新区块号，链上读取按区块缓存
+    chain_state.start()
     return MultiAgentWrapper()
\ No newline at end of file
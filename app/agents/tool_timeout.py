@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+from config import settings
+
+# ==========================================
+# 子 Agent 工具调用的超时控制：
+# 模型一步里发起的多个工具调用由 ToolNode 并发执行 (同步路径走线程池，异步路径 asyncio.gather)，
+# 这一轮的耗时取决于最慢的那个工具；给每个工具设上限，避免一次卡住的搜索 / 检索拖住整轮对话
+# ==========================================
+
+# 同步路径下实际执行工具的线程 (ToolNode 自己的线程只负责等待结果)
+_tool_executor = ThreadPoolExecutor(max_workers=settings.TOOL_MAX_WORKERS, thread_name_prefix="tool-call")
+# 已提交但还没开始执行的调用数 (线程池排队深度)
+_queued = 0
+_queued_lock = threading.Lock()
+
+
+def _track_queue(delta):
+    global _queued
+    with _queued_lock:
+        _queued += delta
+        return _queued
+
+
+def _timeout_message(request, timeout):
+    call = request.tool_call
+    print(f"⏱️ [工具超时] {call['name']} 超过 {timeout:g} 秒未返回，已跳过")
+    return ToolMessage(
+        content=f"工具 {call['name']} 在 {timeout:g} 秒内没有返回结果，本次已跳过。请基于其他已获得的信息回答，不要重复调用。",
+        tool_call_id=call["id"],
+        name=call["name"],
+        status="error",
+    )
+
+
+class ToolTimeoutMiddleware(AgentMiddleware):
+    """
+    按工具名设置超时 (settings.TOOL_TIMEOUTS，未列出的用 settings.TOOL_TIMEOUT)。
+    超时后给模型返回一条错误 ToolMessage，其余工具的结果照常使用；
+    同步工具无法被强行中断，超时的调用会在后台线程里自行结束；还在排队的调用超时后直接取消，不再执行。
+    """
+
+    def __init__(self, timeouts=None, default=None):
+        super().__init__()
+        self.timeouts = {**settings.TOOL_TIMEOUTS, **(timeouts or {})}
+        self.default = default or settings.TOOL_TIMEOUT
+
+    def timeout_for(self, name):
+        return self.timeouts.get(name, self.default)
+
+    def wrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+        timeout = self.timeout_for(name)
+        # 带上当前上下文 (请求 trace 等) 到执行线程
+        context = contextvars.copy_context()
+        started = threading.Event()
+
+        def run():
+            _track_queue(-1)
+            started.set()
+            return context.run(handler, request)
+
+        depth = _track_queue(1)
+        future = _tool_executor.submit(run)
+        # 超时从工具真正开始执行时计算；线程池满载时排队的时间单独等待，同样以 timeout 为上限
+        if not started.wait(timeout):
+            if future.cancel():
+                _track_queue(-1)
+            print(f"⚠️ [工具超时] {name} 排队 {timeout:g} 秒仍未开始执行 (排队 {depth} 个，线程池 {settings.TOOL_MAX_WORKERS} 个线程)")
+            return _timeout_message(request, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            return _timeout_message(request, timeout)
+
+    async def awrap_tool_call(self, request, handler):
+        timeout = self.timeout_for(request.tool_call["name"])
+        try:
+            return await asyncio.wait_for(handler(request), timeout)
+        except asyncio.TimeoutError:
+            return _timeout_message(request, timeout)
@@ -0,0 +1,88 @@
+"""Vectorized analog search: find past price windows whose shape matches a probe."""
+
+from __future__ import annotations
+
+from typing import NamedTuple, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class AnalogMatch(NamedTuple):
+    corr: float
+    start: int
+    first: list[float]
+    last: list[float]
+
+
+def _znorm_rows(matrix: np.ndarray) -> np.ndarray:
+    """Z-normalize each row and scale by 1/sqrt(n) so that a dot product is Pearson's r."""
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=1, keepdims=True)
+    # Flat windows have no shape; give them correlation 0.
+    np.divide(centered, norms, out=centered, where=norms > 0)
+    centered[(norms == 0).ravel()] = 0.0
+    return centered
+
+
+class AnalogIndex:
+    """In-memory index of every ``probe_len + horizon`` window of a price series.
+
+    Windows start every ``stride`` points (``stride=1`` gives fully overlapping
+    windows).  Only the probe part is z-normalized and kept as a dense matrix,
+    so a query is a single matrix-vector product followed by a top-k selection.
+    """
+
+    def __init__(
+        self,
+        prices: Sequence[float],
+        probe_len: int = 5,
+        horizon: int = 5,
+        stride: int = 1,
+    ) -> None:
+        if probe_len < 2 or horizon < 1 or stride < 1:
+            raise ValueError("need probe_len >= 2, horizon >= 1 and stride >= 1")
+        self.prices = np.ascontiguousarray(prices, dtype=np.float64)
+        self.probe_len = probe_len
+        self.horizon = horizon
+        self.stride = stride
+
+        span = probe_len + horizon
+        if len(self.prices) < span:
+            raise ValueError(f"need at least {span} prices, got {len(self.prices)}")
+        windows = sliding_window_view(self.prices, span)[::stride]
+        self.starts = np.arange(len(windows)) * stride
+        self._probes = _znorm_rows(np.array(windows[:, :probe_len]))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def correlations(self, probe: Sequence[float]) -> np.ndarray:
+        """Pearson correlation of ``probe`` against every window, in window order."""
+        query = np.asarray(probe, dtype=np.float64)
+        if query.shape != (self.probe_len,):
+            raise ValueError(f"probe must have {self.probe_len} elements")
+        return self._probes @ _znorm_rows(query[None, :])[0]
+
+    def query(self, probe: Sequence[float], k: int = 1) -> list[AnalogMatch]:
+        """Return the ``k`` best-correlated windows, best first."""
+        corrs = self.correlations(probe)
+        k = min(k, len(corrs))
+        if k <= 0:
+            return []
+        top = np.argpartition(-corrs, k - 1)[:k]
+        top = top[np.argsort(-corrs[top], kind="stable")]
+
+        matches = []
+        for idx in top:
+            start = int(self.starts[idx])
+            mid = start + self.probe_len
+            matches.append(
+                AnalogMatch(
+                    corr=float(corrs[idx]),
+                    start=start,
+                    first=self.prices[start:mid].tolist(),
+                    last=self.prices[mid : mid + self.horizon].tolist(),
+                )
+            )
+        return matches
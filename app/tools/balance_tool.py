@@ -1,5 +1,6 @@
 from langchain.tools import tool
 from app.utils.web3_client import Web3Client
+from app.utils.chain_state import chain_state
 from config import settings
 
 @tool
@@ -14,8 +15,8 @@ def get_balance() -> str:
         my_address = settings.MY_ADDRESS
         
         # 2. 查询链上余额
-        # 'latest' 表示查询最新区块的状态
-        balance_wei = w3.eth.get_balance(my_address, 'latest')
+        # 按最新区块缓存，同一区块内重复查询不再访问节点
+        balance_wei = chain_state.balance(my_address)
         
         # 3. 转换单位 (Wei -> ETH)
         balance_eth = w3.from_wei(balance_wei, 'ether')
@@ -0,0 +1,193 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from config import settings
+
+# ==========================================
+# 混合检索：本地 BM25 倒排索引 + Chroma 向量检索，RRF 融合后在 CPU 上重排
+# ==========================================
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+_CJK = re.compile(r"[一-鿿]+")
+_CAMEL = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "is", "are", "and", "or", "for", "on", "by",
+    "with", "as", "at", "be", "it", "this", "that", "what", "how", "does", "do",
+}
+
+
+def tokenize(text):
+    """
+    英文按单词切分并转小写；sqrtPriceX96 / tickSpacing 这类驼峰标识符
+    既保留整词，也拆成 sqrt / price / x / 96，保证 "tick spacing" 也能命中。
+    中文按相邻两字 (bigram) 切分。
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        lower = word.lower()
+        if lower in _STOPWORDS:
+            continue
+        tokens.append(lower)
+        parts = _CAMEL.findall(word)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+    for run in _CJK.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    """纯 Python 的 BM25 倒排索引：term -> [(文档下标, 词频)]"""
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_len = []
+        for idx, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((idx, tf))
+        self.n_docs = len(self.doc_len)
+        self.avg_len = (sum(self.doc_len) / self.n_docs) if self.n_docs else 0.0
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k):
+        """返回 [(文档下标, 分数)]，按分数从高到低"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[idx] / self.avg_len)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class LexicalReranker:
+    """
+    纯 CPU 的轻量重排：融合排名先验 + 查询词覆盖率 (按 idf 加权) + 相邻词组命中加分。
+    专有名词 (tick spacing、sqrtPriceX96) 完整出现的段落会被提到前面。
+    """
+
+    def rerank(self, query, docs, bm25):
+        terms = list(dict.fromkeys(tokenize(query)))
+        weights = {t: bm25.idf(t) for t in terms}
+        total = sum(weights.values()) or 1.0
+        phrases = [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+
+        scored = []
+        for rank, doc in enumerate(docs):
+            text = doc.page_content.lower()
+            doc_terms = set(tokenize(doc.page_content))
+            coverage = sum(w for t, w in weights.items() if t in doc_terms) / total
+            phrase_hits = sum(1 for p in phrases if p in text)
+            score = 1.0 / (rank + 2) + coverage + 0.2 * phrase_hits
+            scored.append((score, rank, doc))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [doc for _, _, doc in scored]
+
+
+class CrossEncoderReranker:
+    """可选：本地 cross-encoder 模型重排 (需要安装 sentence-transformers)，仍然只用 CPU"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def rerank(self, query, docs, bm25):
+        if not docs:
+            return []
+        scores = self.model.predict([(query, doc.page_content) for doc in docs])
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order]
+
+
+def build_reranker(model_name=None):
+    model_name = settings.RAG_RERANK_MODEL if model_name is None else model_name
+    if model_name:
+        try:
+            return CrossEncoderReranker(model_name)
+        except Exception as e:
+            print(f"⚠️ [系统] 无法加载重排模型 {model_name}，改用轻量重排: {e}")
+    return LexicalReranker()
+
+
+class HybridRetriever:
+    """
+    检索流程：
+    1. 向量检索与 BM25 各取 candidate_pool 个候选
+    2. RRF (Reciprocal Rank Fusion) 融合两路排名
+    3. 重排后返回前 top_k 个段落
+    BM25 索引从 Chroma 里已有的段落构建，index_version() 变化 (重新入库) 时自动重建。
+    """
+
+    RRF_K = 60
+
+    def __init__(self, vectorstore, index_version, reranker=None, candidate_pool=None, top_k=None):
+        self.vectorstore = vectorstore
+        self.index_version = index_version
+        self.reranker = reranker or build_reranker()
+        self.candidate_pool = candidate_pool or settings.RAG_CANDIDATE_POOL
+        self.top_k = top_k or settings.RAG_TOP_K
+        self._lock = threading.Lock()
+        self._built_version = None
+        self._bm25 = None
+        self._docs = []
+
+    def _sparse_index(self):
+        version = self.index_version()
+        if self._built_version != version:
+            with self._lock:
+                if self._built_version != version:
+                    from langchain_core.documents import Document
+
+                    data = self.vectorstore.get(include=["documents", "metadatas"])
+                    docs = [
+                        Document(id=i, page_content=text, metadata=meta or {})
+                        for i, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+                    ]
+                    self._bm25 = BM25Index([d.page_content for d in docs])
+                    self._docs = docs
+                    self._built_version = version
+        return self._bm25, self._docs
+
+    def dense_search(self, query, k):
+        return self.vectorstore.similarity_search(query, k=k)
+
+    def sparse_search(self, query, k):
+        bm25, docs = self._sparse_index()
+        return [docs[idx] for idx, _ in bm25.search(query, k)]
+
+    def fused_search(self, query, k):
+        """两路候选做 RRF 融合，不重排"""
+        pool = max(self.candidate_pool, k)
+        fused = {}
+        scores = defaultdict(float)
+        for ranking in (self.dense_search(query, pool), self.sparse_search(query, pool)):
+            for rank, doc in enumerate(ranking):
+                key = doc.id or doc.page_content
+                fused.setdefault(key, doc)
+                scores[key] += 1.0 / (self.RRF_K + rank + 1)
+        order = sorted(scores, key=scores.get, reverse=True)
+        return [fused[key] for key in order[:pool]]
+
+    def search(self, query, k=None):
+        k = k or self.top_k
+        bm25, _ = self._sparse_index()
+        candidates = self.fused_search(query, k)
+        return self.reranker.rerank(query, candidates, bm25)[:k]
+
+    def invoke(self, query):
+        """与 LangChain retriever 相同的调用方式"""
+        return self.search(query)
@@ -1,23 +1,82 @@
 import requests
+from requests.adapters import HTTPAdapter
 from langchain.tools import tool
+from app.utils.cache import TTLCache
+from app.utils.metrics import traced
+from config import settings
+
+SIMPLE_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
+
+# 常见代号 -> CoinGecko id，避免 "ETH" 这种输入先失败一次
+SYMBOL_TO_ID = {
+    "eth": "ethereum",
+    "btc": "bitcoin",
+    "weth": "weth",
+    "aave": "aave",
+    "usdc": "usd-coin",
+    "usdt": "tether",
+    "dai": "dai",
+    "uni": "uniswap",
+    "link": "chainlink",
+    "sol": "solana",
+    "bnb": "binancecoin",
+    "arb": "arbitrum",
+    "op": "optimism",
+    "matic": "matic-network",
+    "pol": "polygon-ecosystem-token",
+}
+
+# 共享 HTTP 会话 (keep-alive 连接复用)
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# 币价缓存：过期后先返回旧值并在后台刷新；同一币种的并发查询只打一次 API
+_price_cache = TTLCache(ttl=settings.PRICE_CACHE_TTL, stale_ttl=settings.PRICE_STALE_TTL)
+
+
+def resolve_coin_id(symbol):
+    """把用户输入 (ETH / eth / ethereum) 统一成 CoinGecko id"""
+    key = symbol.strip().lower()
+    return SYMBOL_TO_ID.get(key, key)
+
+
+@traced("http", "coingecko.simple_price")
+def _fetch_prices(coin_ids):
+    """一次请求查询多个币种: ids=a,b,c"""
+    response = session.get(
+        SIMPLE_PRICE_URL,
+        params={"ids": ",".join(coin_ids), "vs_currencies": "usd"},
+        timeout=10,
+    )
+    response.raise_for_status()
+    data = response.json()
+    return {coin_id: data.get(coin_id, {}).get("usd") for coin_id in coin_ids}
+
+
+def get_prices(symbols):
+    """批量查价，返回 {原始输入: 美元价格或 None}"""
+    coin_ids = {symbol: resolve_coin_id(symbol) for symbol in symbols}
+    prices = _price_cache.get_many_or_load(list(coin_ids.values()), _fetch_prices)
+    return {symbol: prices.get(coin_id) for symbol, coin_id in coin_ids.items()}
+
 
 @tool
 def get_token_price(symbol: str = "ethereum") -> str:
     """
     查询加密货币的实时市场价格 (美元)。
-    参数 symbol 默认是 'ethereum'。也可以查 'bitcoin', 'aave' 等。
+    参数 symbol 默认是 'ethereum'。也可以查 'bitcoin', 'aave' 或 'ETH', 'BTC' 等代号。
+    需要同时查多个币种时用逗号分隔，例如 'eth,btc,aave'，只会发起一次查询。
     """
+    symbols = [s.strip() for s in symbol.split(",") if s.strip()] or ["ethereum"]
     try:
-        # 简单的 CoinGecko API 调用
-        url = f"https://api.coingecko.com/api/v3/simple/price?ids={symbol}&vs_currencies=usd"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        
-        if symbol in data:
-            price = data[symbol]['usd']
-            return f"📈 {symbol} 当前价格: ${price}"
-        else:
-            return f"❌ 未查询到 {symbol} 的价格，请尝试使用全称 (如 ethereum 而不是 ETH)。"
-            
+        prices = get_prices(symbols)
     except Exception as e:
-        return f"❌ 查价失败: 网络错误或 API 限制"
\ No newline at end of file
+        return f"❌ 查价失败: 网络错误或 API 限制"
+
+    lines = []
+    for name, price in prices.items():
+        if price is not None:
+            lines.append(f"📈 {name} 当前价格: ${price}")
+        else:
+            lines.append(f"❌ 未查询到 {name} 的价格，请尝试使用全称 (如 ethereum) 或常见代号 (如 ETH)。")
+    return "\n".join(lines)
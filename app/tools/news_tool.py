@@ -1,8 +1,124 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit
 from langchain.tools import tool
-from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+from langchain_core.messages.utils import count_tokens_approximately
+from app.utils.cache import TTLCache
+from app.utils.embedding_cache import normalize_query
+from app.utils.metrics import span
+from app.utils.response_cache import embed
+from config import settings
+
+# ==========================================
+# 新闻检索：DuckDuckGo 新闻搜索 -> 结构化条目 -> 按链接与近似正文去重 -> 按 token 预算挑选条目
+# 同一话题的搜索结果按归一化后的搜索词缓存，短时间内的相似提问只联网一次
+# ==========================================
+
+# 初始化免费的无头搜索引擎 (只看最近一周)
+search = DuckDuckGoSearchAPIWrapper(time="w")
+
+# 搜索词里的这些词不影响结果，去掉后 "以太坊最新新闻" 和 "以太坊 新闻" 共用一条缓存
+QUERY_FILLERS = re.compile(r"最新|最近|今天|今日|相关|有什么|有哪些|的|新闻|消息|资讯|动态|\b(?:latest|recent|today|news)\b", re.IGNORECASE)
+# 标题 + 摘要的相似度超过这个值视为同一条新闻 (多家媒体转载)
+NEAR_DUPLICATE = 0.8
+# 链接里的追踪参数，去重前去掉 (前缀匹配 utm_*，其余按参数名精确匹配，不误伤 referrer、refresh 等参数)
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"ref", "fbclid", "gclid"}
+
+_news_cache = TTLCache(ttl=settings.NEWS_CACHE_TTL, stale_ttl=settings.NEWS_STALE_TTL, maxsize=256)
+
+
+def strip_fillers(text):
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", QUERY_FILLERS.sub(" ", text)).strip()
+
+
+def normalize_news_query(query):
+    """缓存键：归一化 (小写、全角转半角) 后去掉填充词"""
+    return strip_fillers(normalize_query(query)) or "crypto"
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonical_url(url):
+    """去掉协议、www、追踪参数和结尾斜杠，同一篇文章的不同链接归一"""
+    parts = urlsplit(url or "")
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not is_tracking_param(k)])
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else "")
+
+
+def _fetch_news(terms):
+    """
+    terms 是去掉填充词后的用户原话 (可能为空，例如只问了 "最新新闻")。
+    优先用新闻频道 (带日期和来源)；没有结果时退回网页搜索
+    """
+    with span("http", "duckduckgo.news"):
+        results = search.results(f"{terms} crypto".strip(), max_results=settings.NEWS_MAX_RESULTS, source="news")
+    if not results:
+        with span("http", "duckduckgo.text"):
+            results = search.results(f"{terms or '加密货币'} 最新 行情 新闻", max_results=settings.NEWS_MAX_RESULTS, source="text")
+    items = []
+    for r in results:
+        if not r.get("link"):
+            continue
+        items.append({
+            "title": (r.get("title") or "").strip(),
+            "source": r.get("source") or urlsplit(r["link"]).netloc.removeprefix("www."),
+            "date": (r.get("date") or "")[:10],
+            "snippet": re.sub(r"\s+", " ", r.get("snippet") or "").strip(),
+            "url": r["link"],
+        })
+    return items
+
+
+def dedupe(items):
+    """按规范化链接去重，再去掉与已保留条目高度相似的转载"""
+    kept, seen_urls, vectors = [], set(), []
+    for item in items:
+        url = canonical_url(item["url"])
+        if url in seen_urls:
+            continue
+        vector = embed(normalize_query(f"{item['title']} {item['snippet']}"))
+        if any(float(vector @ other) >= NEAR_DUPLICATE for other in vectors):
+            continue
+        seen_urls.add(url)
+        vectors.append(vector)
+        kept.append(item)
+    return kept
+
+
+def format_item(item):
+    meta = " · ".join(x for x in (item["source"], item["date"]) if x)
+    return f"- {item['title']} ({meta})\n  {item['snippet']}"
+
+
+def pack(items, token_budget=None):
+    """新的在前，逐条放入，直到 token 预算用完；放不下的条目整条跳过，不在句子中间截断"""
+    token_budget = token_budget or settings.NEWS_TOKEN_BUDGET
+    ranked = sorted(items, key=lambda item: item["date"], reverse=True)
+    lines, used = [], 0
+    for item in ranked:
+        text = format_item(item)
+        tokens = count_tokens_approximately([text])
+        if used + tokens > token_budget:
+            continue
+        lines.append(text)
+        used += tokens
+    return lines
+
+
+def get_news(query):
+    """
+    返回去重后的结构化新闻列表。
+    发给搜索引擎的是用户原话 (去掉填充词)；归一化后的搜索词只用作缓存键，并发的相同搜索只联网一次
+    """
+    key = normalize_news_query(query)
+    return _news_cache.get_or_load(key, lambda: dedupe(_fetch_news(strip_fillers(query))))
 
-# 初始化免费的无头搜索引擎
-search = DuckDuckGoSearchRun()
 
 @tool
 def get_crypto_news(query: str) -> str:
@@ -10,16 +126,12 @@ def get_crypto_news(query: str) -> str:
     获取加密货币相关的最新市场行情、新闻和情绪分析。
     输入搜索关键词，返回互联网上的真实最新数据。
     """
-    print(f"📰 [分析师] 正在连接互联网全网检索: '{query}' ...")
+    print(f"📰 [分析师] 正在检索新闻: '{query}' ...")
     try:
-        # 为了提高搜索准确度，自动在用户关键词后加上 crypto news
-        search_query = f"{query} 最新 行情 新闻"
-        results = search.run(search_query)
-        
-        # 限制返回长度，防止把大语言模型的上下文撑爆
-        if len(results) > 1500:
-            results = results[:1500] + "...(截断)"
-            
-        return results
+        items = get_news(query)
+        lines = pack(items)
+        if not lines:
+            return f"没有找到与 '{query}' 相关的最新新闻。"
+        return f"📰 '{query}' 相关新闻 ({len(lines)} 条，按时间从新到旧):\n" + "\n".join(lines)
     except Exception as e:
-        return f"互联网检索暂时失败，请重试。错误信息: {str(e)}"
\ No newline at end of file
+        return f"互联网检索暂时失败，请重试。错误信息: {str(e)}"
@@ -1,28 +1,21 @@
 from __future__ import annotations
 
 import json
-import math
+import threading
 from pathlib import Path
-from typing import Sequence, Tuple
-from urllib.error import HTTPError, URLError
-from urllib.request import urlopen
+from typing import Optional, Sequence
 
-RECENT_FILE = Path("app/database/coin_gecko_eth_windows_step5_72.json")
+import requests
 
+from app.tools.analog_engine import AnalogIndex, AnalogMatch
+from app.tools.coin_gecko_eth_windows_step5_72 import CHUNK_SIZE, STEP
+from app.tools.price_store import price_store
+from config import settings
 
-def pearson(a: Sequence[float], b: Sequence[float]) -> float:
-    if len(a) != len(b):
-        raise ValueError("sequences must have the same length")
-    n = len(a)
-    mean_a = sum(a) / n
-    mean_b = sum(b) / n
-    numerator = sum((x - mean_a) * (y - mean_b) for x, y in zip(a, b))
-    denom_a = sum((x - mean_a) ** 2 for x in a)
-    denom_b = sum((y - mean_b) ** 2 for y in b)
-    denom = math.sqrt(denom_a * denom_b)
-    if denom == 0:
-        return 0.0
-    return numerator / denom
+# Legacy precomputed windows, only used while the local price store is still empty.
+RECENT_FILE = Path(__file__).resolve().parent.parent / "database" / "coin_gecko_eth_windows_step5_72.json"
+
+_index_cache: dict[tuple, AnalogIndex] = {}
 
 
 def load_windows() -> list[dict]:
@@ -31,43 +24,133 @@ def load_windows() -> list[dict]:
     return json.loads(RECENT_FILE.read_text(encoding="utf-8"))
 
 
-def best_match(probe: Sequence[float]) -> Tuple[float, list[float], list[float]]:
-    if len(probe) != 5:
-        raise ValueError("probe must have 5 elements")
-    windows = load_windows()
-    best_corr = -2.0
-    best_first: list[float] = []
-    best_last: list[float] = []
-    for window in windows:
-        data = window.get("data", [])
-        if len(data) < 10:
-            continue
-        first5 = data[:5]
-        corr = pearson(probe, first5)
-        if corr > best_corr:
-            best_corr = corr
-            best_first = first5
-            best_last = data[5:10]
-    if best_corr == -2.0:
+def load_legacy_series() -> list[float]:
+    """Rebuild the daily close series from the legacy overlapping windows file."""
+    windows = [w.get("data", []) for w in load_windows()]
+    windows = [w for w in windows if len(w) == CHUNK_SIZE]
+    if not windows:
+        raise ValueError("no valid windows found")
+    series = list(windows[0])
+    for window in windows[1:]:
+        series.extend(window[CHUNK_SIZE - STEP :])
+    return series
+
+
+def load_index(
+    probe_len: int = settings.ANALOG_PROBE_LEN,
+    horizon: int = settings.ANALOG_HORIZON,
+    stride: int = settings.ANALOG_STRIDE,
+) -> AnalogIndex:
+    """Return the in-memory analog index, rebuilding it only when the underlying data changes.
+
+    Windows are derived on demand from the memory-mapped price store; the
+    legacy JSON windows are used only until the store holds enough history.
+    """
+    if len(price_store) >= probe_len + horizon:
+        key = ("store", len(price_store), probe_len, horizon, stride)
+        load = price_store.closes
+    elif RECENT_FILE.exists():
+        key = ("legacy", RECENT_FILE.stat().st_mtime_ns, probe_len, horizon, stride)
+        load = load_legacy_series
+    else:
+        raise FileNotFoundError("no ETH price history: price store is empty and legacy windows are missing")
+    index = _index_cache.get(key)
+    if index is None:
+        index = AnalogIndex(load(), probe_len=probe_len, horizon=horizon, stride=stride)
+        _index_cache.clear()
+        _index_cache[key] = index
+    return index
+
+
+def top_matches(probe: Sequence[float], k: int = settings.ANALOG_TOP_K) -> list[AnalogMatch]:
+    """Return the ``k`` best-correlated past windows that do not overlap each other, best first.
+
+    With overlapping windows (small stride) the runners-up of a match are
+    usually the same episode shifted by a day, so those are skipped.
+    """
+    if len(probe) != settings.ANALOG_PROBE_LEN:
+        raise ValueError(f"probe must have {settings.ANALOG_PROBE_LEN} elements")
+    index = load_index(probe_len=len(probe))
+    span = index.probe_len + index.horizon
+    candidates = index.query(probe, k=k * (span // index.stride + 1))
+    matches: list[AnalogMatch] = []
+    for match in candidates:
+        if all(abs(match.start - kept.start) >= span for kept in matches):
+            matches.append(match)
+            if len(matches) == k:
+                break
+    if not matches:
         raise ValueError("no valid windows found")
-    return best_corr, best_first, best_last
+    return matches
 
 
-def get_rag_inform() -> Tuple[float, list[float], list[float]]:
-    """Fetch the last five ETH closing prices and run best_match on them."""
-    url = (
-        "https://api.coingecko.com/api/v3/coins/ethereum/market_chart"
-        "?vs_currency=usd&days=5&interval=daily"
-    )
+def get_rag_inform() -> list[AnalogMatch]:
+    """Bring the price store up to date and match its latest closes against history."""
+    days = settings.ANALOG_PROBE_LEN
     try:
-        with urlopen(url, timeout=10) as response:
-            payload = json.load(response)
-    except (HTTPError, URLError) as exc:
-        raise RuntimeError("failed to fetch ETH prices from CoinGecko") from exc
+        # Only the days missing since the last stored close are fetched.
+        price_store.refresh()
+    except (requests.RequestException, ValueError) as exc:
+        if len(price_store) < days:
+            raise RuntimeError("failed to fetch ETH prices from CoinGecko") from exc
+        print(f"⚠️ [analog] price refresh failed, using stored closes: {exc}")
+
+    closes = price_store.closes()
+    if len(closes) < days:
+        raise ValueError("price store does not hold enough ETH prices")
+
+    recent_closes = [round(float(value), 2) for value in closes[-days:]]
+    return top_matches(recent_closes)
+
+
+class AnalogRefresher:
+    """Recompute ``get_rag_inform`` in a daemon thread and keep the last good result.
+
+    Nothing touches the network until :meth:`start` is called, and a failed
+    refresh never discards the previous result.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.ANALOG_REFRESH_INTERVAL,
+        retry_interval: float = settings.ANALOG_RETRY_INTERVAL,
+    ) -> None:
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self._result: Optional[list[AnalogMatch]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def latest(self) -> Optional[list[AnalogMatch]]:
+        """Return the most recent top matches (best first) or ``None`` before the first success."""
+        with self._lock:
+            return self._result
+
+    def refresh_once(self) -> bool:
+        try:
+            result = get_rag_inform()
+        except Exception as exc:
+            print(f"⚠️ [analog] refresh failed, keeping previous result: {exc}")
+            return False
+        with self._lock:
+            self._result = result
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="analog-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            ok = self.refresh_once()
+            self._stop.wait(self.interval if ok else self.retry_interval)
 
-    prices = payload.get("prices")
-    if not prices or len(prices) < 5:
-        raise ValueError("CoinGecko did not return enough ETH prices")
 
-    recent_closes = [round(float(value), 2) for _, value in prices[-5:]]
-    return best_match(recent_closes)
+analog_refresher = AnalogRefresher()
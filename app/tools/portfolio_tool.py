@@ -0,0 +1,124 @@
+from eth_abi import decode, encode
+from langchain.tools import tool
+from web3 import Web3
+from app.utils.chain_state import chain_state
+from app.utils.web3_client import Web3Client
+from config import settings
+
+# ==========================================
+# 持仓快照：ETH 余额、ERC-20 余额与授权额度、Aave 账户数据，一次 Multicall3 调用全部拿到
+# 所有数据来自同一个区块，按 (区块号, 地址) 缓存
+# ==========================================
+
+# 要查询的 ERC-20：名称 -> (合约地址, 精度)
+TOKENS = {"WETH": (settings.WETH_ADDRESS, 18)}
+# 要检查授权额度的合约：名称 -> 地址
+SPENDERS = {"Aave Pool": settings.AAVE_POOL_ADDRESS}
+# 授权额度不低于这个值 (10000 个代币，即 approve 工具的授权额度) 视为"无需再授权"
+ALLOWANCE_ENOUGH = 10000
+
+
+def _selector(signature):
+    return Web3.keccak(text=signature)[:4]
+
+
+SEL_GET_BLOCK_NUMBER = _selector("getBlockNumber()")
+SEL_GET_ETH_BALANCE = _selector("getEthBalance(address)")
+SEL_BALANCE_OF = _selector("balanceOf(address)")
+SEL_ALLOWANCE = _selector("allowance(address,address)")
+SEL_USER_ACCOUNT_DATA = _selector("getUserAccountData(address)")
+SEL_AGGREGATE3 = _selector("aggregate3((address,bool,bytes)[])")
+
+
+def _build_calls(address):
+    """返回 [(字段名, 目标合约, calldata, 返回值类型)]"""
+    multicall = settings.MULTICALL3_ADDRESS
+    calls = [
+        ("block", multicall, SEL_GET_BLOCK_NUMBER, ["uint256"]),
+        ("eth", multicall, SEL_GET_ETH_BALANCE + encode(["address"], [address]), ["uint256"]),
+    ]
+    for name, (token, _) in TOKENS.items():
+        calls.append((f"balance:{name}", token, SEL_BALANCE_OF + encode(["address"], [address]), ["uint256"]))
+        for spender_name, spender in SPENDERS.items():
+            calls.append((
+                f"allowance:{name}:{spender_name}", token,
+                SEL_ALLOWANCE + encode(["address", "address"], [address, spender]), ["uint256"],
+            ))
+    calls.append((
+        "aave", settings.AAVE_POOL_ADDRESS, SEL_USER_ACCOUNT_DATA + encode(["address"], [address]),
+        ["uint256"] * 6,
+    ))
+    return calls
+
+
+def fetch_snapshot(address, block="latest"):
+    """一次 eth_call 调用 Multicall3.aggregate3，返回 {字段名: 解码后的值}；单个子调用失败时值为 None"""
+    calls = _build_calls(address)
+    data = SEL_AGGREGATE3 + encode(
+        ["(address,bool,bytes)[]"], [[(target, True, calldata) for _, target, calldata, _ in calls]]
+    )
+    w3 = Web3Client.get_instance()
+    raw = w3.eth.call({"to": settings.MULTICALL3_ADDRESS, "data": data}, block)
+    (results,) = decode(["(bool,bytes)[]"], raw)
+
+    snapshot = {}
+    for (name, _, _, types), (success, return_data) in zip(calls, results):
+        if not success or not return_data:
+            snapshot[name] = None
+            continue
+        values = decode(types, return_data)
+        snapshot[name] = values[0] if len(values) == 1 else values
+    return snapshot
+
+
+def get_snapshot(address):
+    address = Web3.to_checksum_address(address)
+    return chain_state.get(("portfolio", address), lambda block: fetch_snapshot(address, block))
+
+
+def format_snapshot(address, snapshot):
+    lines = [f"📊 持仓快照 (地址: {address}, 区块 #{snapshot['block']})"]
+    lines.append(f"- ETH 余额: {Web3.from_wei(snapshot['eth'] or 0, 'ether'):.5f} ETH")
+    for name, (_, decimals) in TOKENS.items():
+        balance = snapshot.get(f"balance:{name}")
+        lines.append(f"- {name} 余额: " + ("查询失败" if balance is None else f"{balance / 10 ** decimals:.5f}"))
+        for spender_name in SPENDERS:
+            allowance = snapshot.get(f"allowance:{name}:{spender_name}")
+            if allowance is None:
+                lines.append(f"- {name} → {spender_name} 授权额度: 查询失败")
+                continue
+            amount = allowance / 10 ** decimals
+            status = "已授权，无需再次 Approve" if amount >= ALLOWANCE_ENOUGH else (
+                "未授权" if amount == 0 else "额度有限，存款金额超过额度时需要重新 Approve"
+            )
+            lines.append(f"- {name} → {spender_name} 授权额度: {amount:.5f} ({status})")
+
+    aave = snapshot.get("aave")
+    if aave is None:
+        lines.append("- Aave 账户数据: 查询失败")
+    else:
+        collateral, debt, available, _, _, health = aave
+        # Aave V3 的 base currency 是 8 位小数的美元
+        health_text = "无借款" if debt == 0 else f"{health / 10 ** 18:.2f}"
+        lines.append(
+            f"- Aave 存款 (抵押) 价值: ${collateral / 10 ** 8:,.2f}，借款: ${debt / 10 ** 8:,.2f}，"
+            f"可借: ${available / 10 ** 8:,.2f}，健康因子: {health_text}"
+        )
+    return "\n".join(lines)
+
+
+@tool
+def get_portfolio_snapshot(address: str = "") -> str:
+    """
+    一次性查询钱包的完整持仓快照：ETH 余额、WETH 余额、WETH 对 Aave 的授权额度、Aave 存款/借款/健康因子。
+    在兑换、授权或存款之前先调用它，判断余额是否足够、是否已经授权 (已授权就不要再发起 Approve)。
+    参数 address 可选，默认查询当前连接的钱包。
+    """
+    address = address.strip() or settings.MY_ADDRESS
+    try:
+        if not Web3.is_address(address):
+            return f"❌ 地址格式不正确: {address}"
+        checksum = Web3.to_checksum_address(address)
+        return format_snapshot(checksum, get_snapshot(checksum))
+    except Exception as e:
+        return f"❌ 查询持仓快照失败: {str(e)}"
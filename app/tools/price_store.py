@@ -0,0 +1,116 @@
+"""Append-only local store of daily closes, memory-mapped for queries."""
+
+from __future__ import annotations
+
+import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import requests
+
+from app.utils.file_lock import file_lock
+from app.utils.metrics import span
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+STORE_FILE = BASE_DIR / "app" / "database" / "eth_daily_closes.bin"
+COINGECKO_ENDPOINT = "https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
+BOOTSTRAP_DAYS = 365
+
+# One fixed-size record per day: days since 1970-01-01 and the close in USD.
+RECORD_DTYPE = np.dtype([("day", "<i4"), ("close", "<f8")])
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def _to_day(date: datetime.date) -> int:
+    return (date - EPOCH).days
+
+
+def _from_day(day: int) -> datetime.date:
+    return EPOCH + datetime.timedelta(days=int(day))
+
+
+class PriceStore:
+    """Daily closes keyed by date, appended to a flat binary file.
+
+    Records are only ever appended in date order, so the file can be
+    memory-mapped as a structured NumPy array and read without parsing.
+    :meth:`refresh` asks CoinGecko only for the days that are missing.
+    Writes hold an exclusive lock on a sidecar ``.lock`` file, so worker
+    processes refreshing at the same time never append the same day twice.
+    """
+
+    def __init__(self, path: Path = STORE_FILE, coin_id: str = "ethereum") -> None:
+        self.path = Path(path)
+        self.coin_id = coin_id
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_size = -1
+
+    def records(self) -> np.ndarray:
+        """All stored records as a read-only memory-mapped structured array."""
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size < RECORD_DTYPE.itemsize:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        if self._mmap is None or size != self._mmap_size:
+            self._mmap = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r",
+                                   shape=(size // RECORD_DTYPE.itemsize,))
+            self._mmap_size = size
+        return self._mmap
+
+    def __len__(self) -> int:
+        return len(self.records())
+
+    def closes(self) -> np.ndarray:
+        return self.records()["close"]
+
+    def last_date(self) -> Optional[datetime.date]:
+        records = self.records()
+        return _from_day(records["day"][-1]) if len(records) else None
+
+    def append(self, closes: Iterable[tuple[datetime.date, float]]) -> int:
+        """Append closes newer than the last stored day; returns how many were written."""
+        with file_lock(self.lock_path):
+            return self._append_locked(closes)
+
+    def _append_locked(self, closes: Iterable[tuple[datetime.date, float]]) -> int:
+        # The last day is read under the lock: another process may have appended since.
+        last = self.last_date()
+        rows = sorted((d, c) for d, c in closes if last is None or d > last)
+        if not rows:
+            return 0
+        data = np.array([(_to_day(d), c) for d, c in rows], dtype=RECORD_DTYPE)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as fh:
+            fh.write(data.tobytes())
+        return len(data)
+
+    def fetch(self, days: int, today: datetime.date) -> list[tuple[datetime.date, float]]:
+        """Fetch settled daily closes for the last ``days`` days (today's partial bar excluded)."""
+        params = {"vs_currency": "usd", "days": days, "interval": "daily"}
+        with span("http", "coingecko.market_chart"):
+            response = requests.get(COINGECKO_ENDPOINT.format(coin_id=self.coin_id), params=params, timeout=30)
+        response.raise_for_status()
+        closes: dict[datetime.date, float] = {}
+        for ts_ms, close in response.json().get("prices", []):
+            date = datetime.datetime.fromtimestamp(ts_ms / 1000, tz=datetime.timezone.utc).date()
+            if date < today:
+                closes.setdefault(date, round(float(close), 2))
+        return sorted(closes.items())
+
+    def refresh(self, today: Optional[datetime.date] = None) -> int:
+        """Fetch only the days missing since the last stored close.
+
+        The check and the fetch run under the store lock, so when several
+        processes refresh together only the first one calls CoinGecko.
+        """
+        today = today or datetime.datetime.now(datetime.timezone.utc).date()
+        with file_lock(self.lock_path):
+            last = self.last_date()
+            if last is not None and last >= today - datetime.timedelta(days=1):
+                return 0
+            days = BOOTSTRAP_DAYS if last is None else (today - last).days
+            return self._append_locked(self.fetch(days, today))
+
+
+price_store = PriceStore()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from langchain_core.documents import Document
+from app.utils.file_lock import file_lock, unique_tmp
+
+# ==========================================
+# 增量入库：只解析变化的 PDF，只向量化新增 / 变化的段落
+# ==========================================
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DOCS_DIR = BASE_DIR / "docs"
+DB_DIR = BASE_DIR / "chroma_db"
+MANIFEST_FILE = DB_DIR / "ingest_manifest.json"
+# 多个 worker 进程同时启动时，只允许一个进程同步知识库
+SYNC_LOCK_FILE = DB_DIR / ".sync.lock"
+
+CHUNK_SIZE = 800      # 因为研报很长，我们把区块大小调大一点
+CHUNK_OVERLAP = 100
+EMBED_BATCH = 64      # 每批送去向量化的段落数
+
+
+def file_hash(path):
+    """文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(rel_path, texts):
+    """段落 ID = 来源文件 + 段落内容的哈希；同一文件里重复的段落加序号区分"""
+    seen = {}
+    ids = []
+    for text in texts:
+        base = hashlib.sha256(f"{rel_path}\0{text}".encode("utf-8")).hexdigest()
+        seen[base] = seen.get(base, 0) + 1
+        ids.append(base if seen[base] == 1 else f"{base}-{seen[base]}")
+    return ids
+
+
+def _parse_pdf(path_str):
+    """子进程里执行：读取并切分一个 PDF，返回 [(段落文本, 元数据)]"""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    pages = PyPDFLoader(path_str).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return [(doc.page_content, doc.metadata) for doc in splitter.split_documents(pages)]
+
+
+def _parse_all(paths):
+    """多个文件时用多进程并行解析 PDF"""
+    if len(paths) <= 1:
+        return {p: _parse_pdf(str(p)) for p in paths}
+    workers = min(len(paths), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(_parse_pdf, [str(p) for p in paths])))
+
+
+def load_manifest():
+    if MANIFEST_FILE.exists():
+        return json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+    return None
+
+
+def save_manifest(manifest):
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = unique_tmp(MANIFEST_FILE)
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(MANIFEST_FILE)
+
+
+def sync_knowledge_base(vectorstore, docs_dir=DOCS_DIR):
+    """
+    让向量库与 docs 目录保持一致，返回本次变更统计。
+    - 文件哈希没变：跳过，不解析也不向量化
+    - 文件新增 / 变化：重新切分，只向量化库里没有的段落，删掉不再存在的段落
+    - 文件被删除：删掉它的全部向量
+    整个同步在跨进程文件锁里执行，清单在拿到锁之后才读取：
+    后拿到锁的 worker 看到的是前一个 worker 写好的清单，不会重复向量化，也不会把刚入库的向量当成旧库清掉
+    """
+    with file_lock(SYNC_LOCK_FILE):
+        return _sync(vectorstore, docs_dir)
+
+
+def _sync(vectorstore, docs_dir):
+    stats = {"files_changed": 0, "files_removed": 0, "chunks_added": 0, "chunks_deleted": 0}
+    manifest = load_manifest()
+    if manifest is None:
+        # 旧版本建的库没有清单，段落 ID 也不是内容哈希：清空后按新规则重建一次
+        existing = vectorstore.get(include=[])["ids"]
+        if existing:
+            print(f"🧹 [系统] 旧版知识库没有入库清单，清理 {len(existing)} 条旧向量后重建...")
+            vectorstore.delete(ids=existing)
+            stats["chunks_deleted"] += len(existing)
+        manifest = {"files": {}}
+    files = manifest["files"]
+
+    current = {p.relative_to(docs_dir).as_posix(): p for p in sorted(Path(docs_dir).rglob("*.pdf"))}
+
+    # 1. 被删除的文件
+    for rel_path in [r for r in files if r not in current]:
+        ids = files.pop(rel_path)["chunks"]
+        if ids:
+            vectorstore.delete(ids=ids)
+        stats["files_removed"] += 1
+        stats["chunks_deleted"] += len(ids)
+        print(f"🗑️ [系统] 已移除 {rel_path} 的 {len(ids)} 个段落")
+
+    # 2. 新增或内容变化的文件
+    hashes = {rel_path: file_hash(path) for rel_path, path in current.items()}
+    changed = [rel_path for rel_path in current if files.get(rel_path, {}).get("sha256") != hashes[rel_path]]
+    if changed:
+        print(f"📖 [系统] 正在解析 {len(changed)} 个新增/变化的 PDF...")
+    parsed = _parse_all([current[r] for r in changed])
+
+    for rel_path in changed:
+        chunks = parsed[current[rel_path]]
+        texts = [text for text, _ in chunks]
+        ids = chunk_ids(rel_path, texts)
+        old_ids = set(files.get(rel_path, {}).get("chunks", []))
+
+        id_set = set(ids)
+        stale = [i for i in old_ids if i not in id_set]
+        if stale:
+            vectorstore.delete(ids=stale)
+        new = [(i, text, meta) for i, (text, meta) in zip(ids, chunks) if i not in old_ids]
+        for start in range(0, len(new), EMBED_BATCH):
+            batch = new[start:start + EMBED_BATCH]
+            vectorstore.add_documents(
+                [Document(page_content=text, metadata={**meta, "source": rel_path}) for _, text, meta in batch],
+                ids=[i for i, _, _ in batch],
+            )
+
+        files[rel_path] = {"sha256": hashes[rel_path], "chunks": ids}
+        save_manifest(manifest)  # 每处理完一个文件就落盘，中途失败也不用从头再来
+        stats["files_changed"] += 1
+        stats["chunks_added"] += len(new)
+        stats["chunks_deleted"] += len(stale)
+        print(f"✅ [系统] {rel_path}: 新增 {len(new)} 段，删除 {len(stale)} 段，未变 {len(ids) - len(new)} 段")
+
+    save_manifest(manifest)
+    return stats
+
+
+if __name__ == "__main__":
+    # get_vectorstore() 打开向量库时就会完成一次增量同步
+    from app.tools.rag_tool import get_vectorstore
+    get_vectorstore()
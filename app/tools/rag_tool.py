@@ -1,44 +1,97 @@
 import os
-from pathlib import Path
+import threading
 from langchain.tools import tool
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-
-# 1. 动态获取绝对路径，防止路径报错
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-DOCS_DIR = BASE_DIR / "docs"
-DB_DIR = BASE_DIR / "chroma_db"
-
-print("📚 [系统] 正在初始化本地 RAG 知识库...")
-embeddings = OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"))
-
-# 2. 检查是否已经存在数据库，避免每次重启重复扣费和等待
-if not DB_DIR.exists():
-    print(f"📖 [系统] 首次运行，正在读取 {DOCS_DIR} 下的 PDF 文件...")
-    # 自动加载 docs 文件夹下的所有 PDF
-    loader = PyPDFDirectoryLoader(str(DOCS_DIR))
-    docs = loader.load()
-    print(f"✅ [系统] 成功读取了 {len(docs)} 页 PDF，正在切分并存入数据库...")
-    
-    # 因为研报很长，我们把区块大小调大一点
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-    split_docs = text_splitter.split_documents(docs)
-    
-    # 创建并永久保存在本地
-    vectorstore = Chroma.from_documents(
-        documents=split_docs, 
-        embedding=embeddings,
-        persist_directory=str(DB_DIR)
+from app.tools.rag_ingest import DB_DIR, MANIFEST_FILE, sync_knowledge_base
+from app.tools.hybrid_retriever import HybridRetriever
+from app.utils.cache import TTLCache
+from app.utils.embedding_cache import CachedQueryEmbeddings, normalize_query
+from config import settings
+
+# 向量库在第一次用到时才打开 (或由 server 启动后在后台预热)，
+# 不再在 import 时同步解析 / 向量化 PDF，拖慢服务启动
+_vectorstore = None
+_retriever = None
+_init_lock = threading.Lock()
+_init_error = None
+
+# 检索结果短期缓存：同一个问题在 TTL 内直接返回，不再向量化也不再检索
+_result_cache = TTLCache(ttl=settings.RAG_RESULT_TTL, maxsize=256)
+
+
+def _build_vectorstore():
+    from langchain_chroma import Chroma
+    from langchain_openai import OpenAIEmbeddings
+
+    print("📚 [系统] 正在初始化本地 RAG 知识库...")
+    # 查询向量按归一化后的文本缓存在本地，重复的问题不再调用向量化接口
+    embeddings = CachedQueryEmbeddings(
+        OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY")),
+        db_path=DB_DIR / "query_embeddings.sqlite",
+        maxsize=settings.RAG_EMBED_CACHE_SIZE,
     )
-    print("✅ [系统] 向量数据库构建并保存成功！")
-else:
-    print("⚡ [系统] 检测到本地已有向量数据库，极速加载中...")
+
+    # 打开 (或新建) 本地向量库，再做一次增量同步：
+    # 只有新增 / 变化的 PDF 才会被解析，只有新段落才会调用向量化接口
     vectorstore = Chroma(persist_directory=str(DB_DIR), embedding_function=embeddings)
+    stats = sync_knowledge_base(vectorstore)
+    if stats.get("chunks_added") or stats.get("chunks_deleted"):
+        print(f"✅ [系统] 知识库已更新: {stats}")
+    else:
+        print("⚡ [系统] 知识库已是最新，极速加载完成！")
+    return vectorstore
+
+
+def get_vectorstore():
+    """懒加载向量库；并发调用时只初始化一次，其余调用等待它完成"""
+    global _vectorstore, _retriever, _init_error
+    if _vectorstore is None:
+        with _init_lock:
+            if _vectorstore is None:
+                try:
+                    vectorstore = _build_vectorstore()
+                except Exception as e:
+                    _init_error = str(e)
+                    raise
+                # 向量 + BM25 混合召回，重排后返回最相关的 RAG_TOP_K 个段落
+                _retriever = HybridRetriever(vectorstore, index_version=_index_version)
+                _vectorstore = vectorstore
+                _init_error = None
+    return _vectorstore
+
+
+def get_retriever():
+    get_vectorstore()
+    return _retriever
+
+
+def _index_version():
+    """入库清单的修改时间：任何进程重新入库后它都会变，旧的检索结果随之失效"""
+    try:
+        return MANIFEST_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def warm_up_in_background():
+    """服务已开始接收请求后，在后台线程里预热知识库"""
+    def _warm_up():
+        try:
+            get_vectorstore()
+        except Exception as e:
+            print(f"⚠️ [系统] 知识库预热失败，将在第一次查询时重试: {e}")
+
+    threading.Thread(target=_warm_up, name="rag-warm-up", daemon=True).start()
+
 
-# 每次检索最相关的前 3 个段落
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+def knowledge_base_status():
+    """供 /ready 接口使用：知识库是否已可用"""
+    if _vectorstore is not None:
+        return {"ready": True, "state": "ready"}
+    if _init_lock.locked():
+        return {"ready": False, "state": "warming_up"}
+    if _init_error:
+        return {"ready": False, "state": "error", "error": _init_error}
+    return {"ready": False, "state": "not_started"}
 
 @tool
 def query_knowledge_base(query: str) -> str:
@@ -47,7 +100,12 @@ def query_knowledge_base(query: str) -> str:
     当用户问到具体的协议机制（如集中流动性、无常损失）、宏观市场周期，或者需要极度专业的分析支撑时，必须调用此工具。
     """
     print(f"📖 [分析师] 正在翻阅顶级研报与白皮书检索: '{query}' ...")
-    results = retriever.invoke(query)
+    try:
+        retriever = get_retriever()
+        key = (_index_version(), normalize_query(query))
+        results = _result_cache.get_or_load(key, lambda: retriever.invoke(query))
+    except Exception as e:
+        return f"本地知识库暂时不可用，请稍后再试。错误信息: {str(e)}"
     
     if not results:
         return "本地知识库中未找到相关专业资料。"
@@ -1,6 +1,8 @@
-import os
 from langchain.tools import tool
 from app.utils.web3_client import Web3Client
+from app.utils.chain_state import chain_state
+from app.utils.calldata import deposit_calldata
+from app.utils.tx_manager import tx_manager
 from config import settings
 
 @tool
@@ -15,35 +17,27 @@ def swap_eth_to_weth(amount_str: str) -> str:
         account = Web3Client.get_account()
         
         amount_wei = w3.to_wei(amount_str, "ether")
-        weth_contract = w3.eth.contract(address=settings.WETH_ADDRESS, abi=settings.WETH_ABI)
         
         # WETH 的存款很简单，就是直接转 ETH 进去
-        nonce = w3.eth.get_transaction_count(settings.MY_ADDRESS)
-        
         # 构建交易 (调用 WETH 合约的 deposit 方法，并附带 ETH value)
-        # 注意：WETH 的 deposit 函数在 ABI 里可能没写名字，它通常是一个 receive/fallback 函数，
-        # 但标准的 WETH9 也有 deposit()。为了稳妥，我们直接往合约地址转账即可（WETH 合约会自动 wrap）。
-        # 不过，标准的 web3py 调用习惯是调用函数。只要你的 settings.py 里 WETH ABI 是对的。
-        # 如果你的 ABI 里没有 deposit，我们可以直接构造一个普通转账，但 data 必须为空。
-        
-        # 这里我们假设用最通用的方法：调用 deposit()
-        # 如果报错，说明 settings.py 的 ABI 需要检查一下有没有 deposit
-        tx = weth_contract.functions.deposit().build_transaction({
+        # data 由预编译的编码器生成；nonce 由 tx_manager 分配
+        tx = {
             'from': settings.MY_ADDRESS,
+            'to': settings.WETH_ADDRESS,
+            'data': deposit_calldata(),
             'value': amount_wei, # 这里附带你要换的 ETH
             'gas': 100000,
-            'gasPrice': int(w3.eth.gas_price * 1.2),
-            'nonce': nonce,
+            'gasPrice': int(chain_state.gas_price() * 1.2),
             'chainId': settings.SEPOLIA_CHAIN_ID
-        })
-        
-        signed_tx = w3.eth.account.sign_transaction(tx, os.getenv("PRIVATE_KEY"))
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        }
         
-        # 等待回执
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        # 广播后立即返回，不等待出块；回执由后台线程跟踪
+        tx_hash = tx_manager.submit(tx, f"兑换 {amount_str} ETH 为 WETH")
         
-        return f"🔄 兑换成功！\n已将 {amount_str} ETH 换为 WETH。\n交易哈希: {w3.to_hex(tx_hash)}"
+        return (
+            f"🔄 兑换交易已提交，等待上链！\n将 {amount_str} ETH 换为 WETH。\n交易哈希: {tx_hash}\n"
+            f"可以稍后用 get_transaction_status 查询确认结果。"
+        )
 
     except Exception as e:
         return f"❌ 兑换失败: {str(e)}"
\ No newline at end of file
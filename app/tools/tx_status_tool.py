@@ -0,0 +1,36 @@
+import time
+from langchain.tools import tool
+from app.utils.tx_manager import tx_manager
+
+STATUS_TEXT = {"pending": "⏳ 等待上链", "success": "✅ 已成功上链", "failed": "❌ 已上链但执行失败"}
+
+
+def format_record(record):
+    line = f"- {record['description']}: {STATUS_TEXT[record['status']]}\n  交易哈希: {record['hash']}"
+    if record["status"] == "pending":
+        line += f" (已等待 {time.time() - record['submitted_at']:.0f} 秒)"
+    else:
+        line += f" (区块 #{record['block']}, gas 消耗 {record['gas_used']})"
+    return line
+
+
+@tool
+def get_transaction_status(tx_hash: str = "") -> str:
+    """
+    查询之前提交的交易是否已经上链 (兑换等交易提交后会立即返回哈希，不等待确认)。
+    参数 tx_hash 可选；不传时列出最近提交的几笔交易及其状态。
+    """
+    try:
+        tx_hash = tx_hash.strip()
+        if not tx_hash:
+            records = tx_manager.recent()
+            if not records:
+                return "📭 本次运行期间还没有提交过交易。"
+            return "🧾 最近提交的交易:\n" + "\n".join(format_record(r) for r in records)
+
+        record = tx_manager.status(tx_hash)
+        if record is None:
+            return f"❓ 没有找到这笔交易的提交记录: {tx_hash}"
+        return format_record(record)
+    except Exception as e:
+        return f"❌ 查询交易状态失败: {str(e)}"
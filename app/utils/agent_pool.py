@@ -0,0 +1,68 @@
+import asyncio
+from contextlib import asynccontextmanager
+from config import settings
+
+
+class AgentBusyError(RuntimeError):
+    """排队已满或等待超时，调用方应直接返回 503。"""
+
+
+class AgentPool:
+    """
+    限制同时运行的 Agent 图数量，并给排队长度设上限。
+    - 最多 max_concurrency 个请求并行执行
+    - 最多 max_queue 个请求排队等待，再多的请求立刻被拒绝
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=None, queue_timeout=None):
+        self.max_concurrency = max_concurrency or settings.AGENT_MAX_CONCURRENCY
+        self.max_queue = settings.AGENT_MAX_QUEUE if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout or settings.AGENT_QUEUE_TIMEOUT
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._running = 0
+        self._waiting = 0
+
+    @property
+    def stats(self):
+        return {
+            "running": self._running,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+    @property
+    def full(self):
+        """正在执行 + 正在排队 的总数达到上限"""
+        return self._running + self._waiting >= self.max_concurrency + self.max_queue
+
+    async def acquire(self):
+        """占用一个执行名额；队列已满时立即抛出 AgentBusyError，而不是挂起。"""
+        if self.full:
+            raise AgentBusyError("Agent 正忙，排队人数已满")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise AgentBusyError("Agent 正忙，排队等待超时")
+        finally:
+            self._waiting -= 1
+        self._running += 1
+
+    def release(self):
+        self._running -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run(self, coro_fn, *args, **kwargs):
+        """在名额内执行一个协程函数。"""
+        async with self.slot():
+            return await coro_fn(*args, **kwargs)
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# 后台刷新过期数据用的线程池 (所有缓存共用)
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+class TTLCache:
+    """
+    进程内 TTL 缓存 (线程安全)：
+    - ttl 秒内直接返回缓存
+    - 过期后 stale_ttl 秒内先返回旧值，同时在后台刷新 (stale-while-revalidate)
+    - 同一个 key 的并发加载会合并成一次上游调用 (request coalescing)
+    - 超过 maxsize 时淘汰最久未使用的条目
+    """
+
+    def __init__(self, ttl, stale_ttl=0, maxsize=1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (value, 写入时间)
+        self._inflight = {}         # key -> Future
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """只读缓存：新鲜则返回值，否则返回 None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                self._data.move_to_end(key)
+                return entry[0]
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def invalidate(self, key=None):
+        """删除一个 key；不传参数时清空全部"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def get_or_load(self, key, loader):
+        """读取缓存，必要时调用 loader() 加载"""
+        return self.get_many_or_load([key], lambda keys: {keys[0]: loader()})[key]
+
+    def get_many_or_load(self, keys, batch_loader):
+        """
+        批量读取：缓存里没有的 key 一次性交给 batch_loader(keys) 加载，
+        batch_loader 返回 {key: value}，没有返回的 key 记为 None。
+        """
+        results = {}
+        waiting = {}   # 别的线程正在加载的 key
+        to_load = []   # 需要本线程加载的 key
+        to_refresh = []
+        now = time.monotonic()
+
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._data.get(key)
+                age = now - entry[1] if entry else None
+                if entry and age < self.ttl:
+                    self._data.move_to_end(key)
+                    results[key] = entry[0]
+                elif entry and age < self.ttl + self.stale_ttl:
+                    # 旧值还能用：先返回，再后台刷新
+                    results[key] = entry[0]
+                    if key not in self._inflight:
+                        self._inflight[key] = Future()
+                        to_refresh.append(key)
+                elif key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    self._inflight[key] = Future()
+                    to_load.append(key)
+
+        if to_refresh:
+            _refresh_executor.submit(self._load, to_refresh, batch_loader, True)
+        if to_load:
+            results.update(self._load(to_load, batch_loader))
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return results
+
+    def _load(self, keys, batch_loader, background=False):
+        try:
+            loaded = batch_loader(list(keys))
+        except Exception as e:
+            with self._lock:
+                futures = [self._inflight.pop(key) for key in keys]
+            for future in futures:
+                future.set_exception(e)
+            if background:
+                # 后台刷新失败不影响调用方，旧值继续使用到彻底过期
+                print(f"⚠️ [缓存] 后台刷新失败: {e}")
+                return {}
+            raise
+
+        values = {key: loaded.get(key) for key in keys}
+        with self._lock:
+            futures = []
+            for key, value in values.items():
+                self._store(key, value)
+                futures.append((self._inflight.pop(key), value))
+        for future, value in futures:
+            future.set_result(value)
+        return values
+
+    def _store(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
@@ -0,0 +1,45 @@
+from eth_abi import encode
+from eth_utils.abi import function_abi_to_4byte_selector, get_abi_input_types
+from config import settings
+
+# ==========================================
+# 预编译的 calldata 编码器：启动时从 settings 里的 ABI 算好函数选择器与参数类型，
+# 之后生成 supply / approve / deposit 的 data 字段不访问 RPC，也不构造临时交易对象
+# ==========================================
+
+
+class FunctionEncoder:
+    """一个合约函数的选择器 + 参数类型"""
+
+    def __init__(self, abi_entry):
+        self.name = abi_entry["name"]
+        self.selector = function_abi_to_4byte_selector(abi_entry)
+        self.input_types = get_abi_input_types(abi_entry)
+
+    def encode(self, *args):
+        """返回 0x 开头的 calldata 十六进制字符串"""
+        return "0x" + (self.selector + encode(self.input_types, list(args))).hex()
+
+
+def load_encoders(abi):
+    """ABI 里的每个函数 -> FunctionEncoder"""
+    return {entry["name"]: FunctionEncoder(entry) for entry in abi if entry.get("type") == "function"}
+
+
+WETH = load_encoders(settings.WETH_ABI)
+AAVE_POOL = load_encoders(settings.AAVE_ABI)
+
+
+def supply_calldata(asset, amount_wei, on_behalf_of, referral_code=0):
+    """Aave Pool.supply(asset, amount, onBehalfOf, referralCode)"""
+    return AAVE_POOL["supply"].encode(asset, amount_wei, on_behalf_of, referral_code)
+
+
+def approve_calldata(spender, amount_wei):
+    """WETH.approve(guy, wad)"""
+    return WETH["approve"].encode(spender, amount_wei)
+
+
+def deposit_calldata():
+    """WETH.deposit()，ETH 通过交易的 value 附带"""
+    return WETH["deposit"].encode()
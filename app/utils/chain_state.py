@@ -0,0 +1,127 @@
+import threading
+import time
+from app.utils.cache import TTLCache
+from app.utils.web3_client import Web3Client
+from config import settings
+
+# ==========================================
+# 按区块缓存的链上状态：gas 价格、base fee、余额、pending nonce、合约只读调用
+# 同一个区块内重复读取直接命中缓存，新区块出现后旧数据自然失效
+# ==========================================
+
+
+class ChainState:
+    """
+    所有工具共用的链上状态缓存。
+    - 最新区块号由后台线程每 poll_interval 秒查询一次 (HTTP 节点没有 newHeads 订阅，用轮询代替)；
+      后台线程没启动或结果过期时，第一次读取会顺带同步刷新一次
+    - 缓存键 = (区块号, 数据项)，同一区块内的并发读取合并成一次 RPC (复用 TTLCache 的请求合并)
+    - 余额、合约调用都固定在该区块上读取，一轮对话里看到的是同一份链上快照
+    """
+
+    def __init__(self, poll_interval=None, maxsize=1024):
+        self.poll_interval = poll_interval or settings.BLOCK_POLL_INTERVAL
+        # 区块号本身就是键的一部分，TTL 只是兜底清理
+        self._cache = TTLCache(ttl=max(60.0, self.poll_interval * 10), maxsize=maxsize)
+        self._block = None
+        self._updated = 0.0
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- 区块号 ----------
+    def refresh_block(self):
+        number = Web3Client.get_instance().eth.block_number
+        with self._lock:
+            # 多个节点之间可能有一两个块的差距，区块号只进不退
+            if self._block is None or number >= self._block:
+                self._block = number
+            self._updated = time.monotonic()
+            return self._block
+
+    def _stale(self):
+        return self._block is None or time.monotonic() - self._updated > self.poll_interval
+
+    def block_number(self):
+        if self._stale():
+            # 多个线程同时发现过期时只查询一次，其余线程等它的结果
+            with self._poll_lock:
+                if self._stale():
+                    self.refresh_block()
+        return self._block
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="block-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        failed = False
+        while not self._stop.is_set():
+            try:
+                self.refresh_block()
+                failed = False
+            except Exception as e:
+                if not failed:
+                    print(f"⚠️ [链上状态] 查询最新区块失败，稍后重试: {e}")
+                failed = True
+            self._stop.wait(self.poll_interval)
+
+    # ---------- 按区块缓存 ----------
+    def get(self, key, loader):
+        """读取当前区块下的 key；没有缓存时调用 loader(区块号) 加载"""
+        block = self.block_number()
+        cache_key = (block, key)
+        value = self._cache.get(cache_key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return self._cache.get_or_load(cache_key, lambda: loader(block))
+
+    def invalidate(self, key):
+        """本地刚发出交易等情况：当前区块下的这项数据作废"""
+        if self._block is not None:
+            self._cache.invalidate((self._block, key))
+
+    def gas_price(self):
+        return self.get("gas_price", lambda block: Web3Client.get_instance().eth.gas_price)
+
+    def base_fee(self):
+        return self.get(
+            "base_fee", lambda block: Web3Client.get_instance().eth.get_block(block).get("baseFeePerGas", 0)
+        )
+
+    def balance(self, address):
+        return self.get(("balance", address), lambda block: Web3Client.get_instance().eth.get_balance(address, block))
+
+    def call(self, to, data):
+        return self.get(
+            ("call", to, data), lambda block: Web3Client.get_instance().eth.call({"to": to, "data": data}, block)
+        )
+
+    def pending_nonce(self, address):
+        """
+        节点的 pending nonce，每个区块最多查询一次。
+        同一区块内本地连续提交的交易由 NonceManager 的本地计数递增，不需要每笔都查
+        """
+        return self.get(
+            ("nonce", address),
+            lambda block: Web3Client.get_instance().eth.get_transaction_count(address, "pending"),
+        )
+
+    def invalidate_account(self, address):
+        """地址刚发出交易：余额与持仓快照都要重新读"""
+        self.invalidate(("balance", address))
+        self.invalidate(("portfolio", address))
+
+
+chain_state = ChainState()
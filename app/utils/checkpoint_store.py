@@ -0,0 +1,367 @@
+import asyncio
+import atexit
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from config import settings
+
+# ==========================================
+# 落盘的 LangGraph 检查点存储 (SQLite)：
+# - put_writes (每个任务的中间写入) 先进缓冲区，和下一次 put 的检查点放在同一个事务里提交；
+#   put 本身立即提交，请求返回前检查点已经落盘，其他 worker 马上能读到；
+#   缓冲区里剩下的写入由后台线程每 flush_interval 秒提交一次，读取前也会先刷盘
+# - 每个会话线程只保留最近 keep_last 个检查点，旧检查点、它们的 writes 与不再引用的通道数据一起删除
+# - 通道数据 (消息列表等) 超过一定大小时 zlib 压缩
+# - sessions 表记录每个会话最近一次写入的时间，闲置会话由数据库侧的清理统一删除 (各 worker 看到的是同一份活跃时间)
+# 多个 uvicorn worker 可以共用同一个数据库文件 (WAL 模式)，进程内存不随会话数增长
+# ==========================================
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DB = BASE_DIR / "app" / "database" / "checkpoints.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+    parent_id TEXT, type TEXT, checkpoint BLOB, meta_type TEXT, metadata BLOB, versions TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT, type TEXT, value BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL,
+    type TEXT, value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS sessions (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+"""
+# 读取检查点时用到的列 (顺序与 _load_tuple 的解包一致)
+COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, meta_type, metadata"
+
+
+class CompressedSerializer:
+    """包装一个 serde：序列化结果超过 min_bytes 时 zlib 压缩，类型名前加 "z:" 标记"""
+
+    def __init__(self, serde=None, min_bytes=None, level=6):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_bytes = settings.CHECKPOINT_COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+        self.level = level
+
+    def dumps_typed(self, obj):
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.min_bytes:
+            return f"z:{type_}", zlib.compress(data, self.level)
+        return type_, data
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.startswith("z:"):
+            return self.serde.loads_typed((type_[2:], zlib.decompress(payload)))
+        return self.serde.loads_typed((type_, payload))
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """
+    与 MemorySaver 行为一致的 SQLite 检查点存储，可以直接传给 workflow.compile(checkpointer=...)。
+    同一进程内所有线程共用一个连接 (加锁)；其他进程通过 WAL 并发读写同一个文件。
+    会话回收也在这里完成 (sweep_idle)，调用方不需要在进程内按会话调用 delete_thread。
+    """
+
+    manages_eviction = True
+
+    def __init__(self, path=None, keep_last=None, flush_interval=None, serde=None,
+                 idle_ttl=None, max_sessions=None, sweep_interval=60.0):
+        super().__init__(serde=CompressedSerializer(serde))
+        self.path = Path(path or settings.CHECKPOINT_DB or DEFAULT_DB)
+        self.keep_last = keep_last or settings.CHECKPOINT_KEEP_LAST
+        self.flush_interval = flush_interval or settings.CHECKPOINT_FLUSH_INTERVAL
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # 旧版本数据库里的会话没有活跃时间：从现在开始计时，之后照常回收
+        with self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO sessions SELECT DISTINCT thread_id, ? FROM checkpoints", (time.time(),)
+            )
+        self.idle_ttl = idle_ttl or settings.SESSION_IDLE_TTL
+        self.max_sessions = max_sessions or settings.SESSION_MAX_COUNT
+        self.sweep_interval = sweep_interval
+        self._lock = threading.RLock()
+        self._pending = []          # [(sql, 参数)]，按写入顺序提交
+        self._dirty_threads = set()  # 本批写入涉及的 (thread_id, checkpoint_ns)，提交后做裁剪
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="checkpoint-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- 批量提交 ----------
+    def _run(self):
+        last_sweep = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - last_sweep >= self.sweep_interval:
+                    last_sweep = time.monotonic()
+                    self.sweep_idle()
+            except Exception as e:
+                print(f"⚠️ [检查点] 批量写入失败，下次重试: {e}")
+
+    def sweep_idle(self):
+        """删除闲置超过 idle_ttl 的会话，以及超出 max_sessions 的最久未活跃会话；返回删除的数量"""
+        with self._lock:
+            self.flush()
+            cutoff = time.time() - self.idle_ttl
+            rows = self._db.execute(
+                "SELECT thread_id FROM sessions WHERE last_seen < ? OR thread_id IN "
+                "(SELECT thread_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+                (cutoff, self.max_sessions),
+            ).fetchall()
+            with self._db:
+                for (thread_id,) in rows:
+                    self._delete(thread_id)
+        for (thread_id,) in rows:
+            print(f"🧹 [会话] 回收闲置会话: {thread_id}")
+        return len(rows)
+
+    def flush(self):
+        """把缓冲区里的写入放进一个事务提交，并裁剪涉及到的线程"""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._db:
+                for sql, params in self._pending:
+                    self._db.execute(sql, params)
+                for thread_id, checkpoint_ns in self._dirty_threads:
+                    self._prune(thread_id, checkpoint_ns)
+            self._pending.clear()
+            self._dirty_threads.clear()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _prune(self, thread_id, checkpoint_ns):
+        """只保留最近 keep_last 个检查点；删掉旧检查点的 writes 和不再被引用的通道数据"""
+        rows = self._db.execute(
+            "SELECT checkpoint_id, versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns),
+        ).fetchall()
+        if checkpoint_ns == "" and len(rows) >= self.keep_last:
+            self._prune_subgraphs(thread_id, rows[self.keep_last - 1][0])
+        if len(rows) <= self.keep_last:
+            return
+        stale = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, _ in rows[self.keep_last:]]
+        sql_where = "thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+        self._db.executemany(f"DELETE FROM checkpoints WHERE {sql_where}", stale)
+        self._db.executemany(f"DELETE FROM writes WHERE {sql_where}", stale)
+
+        referenced = set()
+        for _, versions in rows[:self.keep_last]:
+            referenced.update((channel, str(version)) for channel, version in json.loads(versions).items())
+        blobs = self._db.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+        ).fetchall()
+        self._db.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in blobs if (channel, version) not in referenced],
+        )
+
+    def _prune_subgraphs(self, thread_id, oldest_kept):
+        """
+        子 Agent (create_agent 子图) 每次运行都有自己的 checkpoint_ns，运行结束后就不再使用；
+        最后一个检查点早于主图保留窗口的子图命名空间整个删掉
+        """
+        namespaces = [
+            (thread_id, ns) for (ns,) in self._db.execute(
+                "SELECT checkpoint_ns FROM checkpoints WHERE thread_id = ? AND checkpoint_ns != '' "
+                "GROUP BY checkpoint_ns HAVING MAX(checkpoint_id) < ?",
+                (thread_id, oldest_kept),
+            ).fetchall()
+        ]
+        for table in ("checkpoints", "writes", "blobs"):
+            self._db.executemany(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ?", namespaces)
+
+    # ---------- 写入 ----------
+    def put(self, config, checkpoint, metadata, new_versions):
+        c = checkpoint.copy()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values = c.pop("channel_values")
+        with self._lock:
+            for channel, version in new_versions.items():
+                type_, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+                self._pending.append((
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), type_, blob),
+                ))
+            type_, data = self.serde.dumps_typed(c)
+            meta_type, meta = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+            self._pending.append((
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                    type_, data, meta_type, meta, json.dumps({k: str(v) for k, v in c["channel_versions"].items()}),
+                ),
+            ))
+            self._dirty_threads.add((thread_id, checkpoint_ns))
+            self._pending.append((
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?)", (thread_id, time.time()),
+            ))
+            # 检查点立即提交 (连同缓冲区里之前的 writes)，不等后台线程
+            self.flush()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                type_, blob = self.serde.dumps_typed(value)
+                # 特殊通道 (错误、中断等) 的写入可以覆盖，普通写入已存在时保留第一次的结果
+                verb = "INSERT OR REPLACE" if write_idx < 0 else "INSERT OR IGNORE"
+                self._pending.append((
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, blob, task_path),
+                ))
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self.flush()
+            with self._db:
+                self._delete(thread_id)
+
+    def _delete(self, thread_id):
+        for table in ("checkpoints", "writes", "blobs", "sessions"):
+            self._db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # ---------- 读取 ----------
+    def _load_tuple(self, row):
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, meta_type, meta = row
+        checkpoint = self.serde.loads_typed((type_, data))
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = self._db.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob and blob[0] != "empty":
+                channel_values[channel] = self.serde.loads_typed(blob)
+        writes = self._db.execute(
+            "SELECT task_id, channel, type, value, task_path, idx FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[4], w[0], w[5]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((meta_type, meta)),
+            pending_writes=[(task, channel, self.serde.loads_typed((t, v))) for task, channel, t, v, _, _ in writes],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            self.flush()
+            if checkpoint_id:
+                row = self._db.execute(
+                    f"SELECT {COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._db.execute(
+                    f"SELECT {COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._load_tuple(row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self.flush()
+            rows = self._db.execute(
+                f"SELECT {COLUMNS} FROM checkpoints {where} ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+                params,
+            ).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                item = self._load_tuple(row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(item)
+        yield from results
+
+    # 异步接口：在线程池里执行同步版本，不阻塞事件循环
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current, channel):
+        # 与 MemorySaver 相同的版本号格式：递增序号 + 随机后缀
+        current_v = 0 if current is None else current if isinstance(current, int) else int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def create_checkpointer():
+    """按 settings.CHECKPOINT_BACKEND 创建检查点存储：sqlite (默认，落盘) 或 memory (仅进程内)"""
+    if settings.CHECKPOINT_BACKEND == "memory":
+        return MemorySaver()
+    return SQLiteCheckpointer()
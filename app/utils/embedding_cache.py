@@ -0,0 +1,68 @@
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_query(text):
+    """统一大小写与空白，让 "  What is  IL?" 和 "what is il?" 命中同一条缓存"""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    给查询向量加缓存的 Embeddings 包装器：
+    - 内存 LRU (最多 maxsize 条) + SQLite 持久化，重启后依然命中
+    - 键 = 模型名 + 归一化后的查询文本
+    - embed_documents (入库) 不缓存，直接透传给底层模型
+    """
+
+    def __init__(self, embeddings, db_path, maxsize=2048):
+        self.embeddings = embeddings
+        self.maxsize = maxsize
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._db.commit()
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = f"{self.model}\0{normalize_query(text)}"
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is None:
+                row = self._db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = array("d", row[0]).tolist()
+            if vector is not None:
+                self.hits += 1
+                self._remember(key, vector)
+                return vector
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._remember(key, vector)
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)",
+                (key, array("d", vector).tobytes()),
+            )
+            self._db.commit()
+        return vector
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ==========================================
+# 跨进程文件锁：uvicorn 多 worker 时，同一时刻只有一个进程写共享文件 (知识库清单、价格库)
+# 同一进程内的线程先用进程内锁排队，文件锁只在进程之间生效
+# ==========================================
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(path, threading.Lock())
+
+
+@contextmanager
+def file_lock(path):
+    """独占锁住 path (不存在时自动创建)，阻塞直到拿到锁"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _thread_lock(str(path.resolve())):
+        with open(path, "a+b") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            else:
+                # msvcrt 的阻塞锁最多重试 10 秒就报错，这里一直等
+                fh.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def unique_tmp(path):
+    """同目录下、每个进程 / 线程各不相同的临时文件名，用于先写临时文件再原子替换"""
+    path = Path(path)
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
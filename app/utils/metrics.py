@@ -0,0 +1,235 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+
+# ==========================================
+# 延迟追踪：节点 / LLM / 工具 / RPC / 外部 HTTP 的耗时直方图 + 单次请求的追踪记录
+# 直方图以 Prometheus 文本格式暴露在 /metrics
+# ==========================================
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """按标签分组的累积直方图 (与 Prometheus histogram 语义一致)"""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 标签值 -> [各桶计数..., 总和, 总次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labelvalues, series in items:
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """直方图 + 回调式 gauge (渲染时才取值，例如 Agent 池的排队人数)"""
+
+    def __init__(self):
+        self.histograms = []
+        self.gauges = []  # (名称, 说明, 回调)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        hist = Histogram(name, help_text, labelnames, buckets)
+        self.histograms.append(hist)
+        return hist
+
+    def gauge(self, name, help_text, fn):
+        self.gauges.append((name, help_text, fn))
+
+    def render(self):
+        lines = []
+        for hist in self.histograms:
+            lines.extend(hist.render())
+        for name, help_text, fn in self.gauges:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+span_seconds = registry.histogram(
+    "agent_span_seconds", "Duration of graph nodes, LLM calls, tools, RPC and HTTP calls", ("kind", "name")
+)
+request_seconds = registry.histogram("agent_request_seconds", "End-to-end duration of chat requests", ("endpoint",))
+
+
+# ==========================================
+# 单次请求的追踪记录
+# ==========================================
+class Trace:
+    """一次请求内所有 span 的明细，线程安全 (同步节点跑在线程池里)"""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, kind, name, start, duration):
+        with self._lock:
+            self.spans.append((kind, name, start - self.started, duration))
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s[2])
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "spans": [
+                {"kind": kind, "name": name, "start_ms": round(start * 1000, 1), "ms": round(duration * 1000, 1)}
+                for kind, name, start, duration in spans
+            ],
+        }
+
+
+_current_trace = contextvars.ContextVar("agent_trace", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(trace_id=None):
+    """开启一次请求的追踪；内部的 span 会同时记进直方图和这条追踪"""
+    trace = Trace(trace_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_span(kind, name, start, duration, trace=None):
+    span_seconds.observe(duration, kind, name)
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.add(kind, name, start, duration)
+
+
+@contextmanager
+def span(kind, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(kind, name, start, time.perf_counter() - start)
+
+
+def traced(kind, name=None):
+    """给同步 / 异步函数计时的装饰器"""
+
+    def decorator(fn):
+        label = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, label):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _node_of(metadata):
+    """LLM 所在的顶层图节点：子 Agent 内部的调用也算在 analyst / executor 名下"""
+    namespace = (metadata or {}).get("langgraph_checkpoint_ns", "")
+    return namespace.split(":")[0] or "direct"
+
+
+class TracingCallback(BaseCallbackHandler):
+    """
+    LangChain 回调：记录图里每次 LLM 调用与工具调用的耗时。
+    按 run_id 配对开始 / 结束事件，LLM 以所在的图节点命名 (如 llm:supervisor)。
+    """
+
+    run_inline = True
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, kind, name):
+        with self._lock:
+            self._started[run_id] = (kind, name, time.perf_counter())
+
+    def _end(self, run_id):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started:
+            kind, name, start = started
+            record_span(kind, name, start, time.perf_counter() - start, self.trace)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", f"llm:{_node_of(metadata)}")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "llm", f"llm:{_node_of(metadata)}")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
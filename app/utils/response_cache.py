@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+from app.utils.embedding_cache import normalize_query
+from config import settings
+
+# ==========================================
+# 分析师回复的语义缓存：
+# "什么是无常损失" / "无常损失是什么？" 这类反复出现的概念问题直接返回上次的回答，不再调用 LLM
+# 问题向量用本地的字符 n-gram 哈希算出 (不调用 Embedding API，微秒级)
+# ==========================================
+
+# 引用上下文的问题 ("它"、"刚才那个") 脱离对话历史就没有意义，不走缓存
+CONTEXT_WORDS = ("它", "这个", "那个", "上面", "刚才", "之前", "继续", "还有呢", "为什么呢")
+CONTEXT_TOKENS = {"it", "this", "that", "these", "those", "above", "previous", "again"}
+# 提问套话：去掉后 "什么是无常损失" / "解释一下无常损失" / "无常损失是什么？" 都归一成 "无常损失"
+QUESTION_FILLERS = re.compile(
+    r"请问|请你|请|帮我|给我|能不能|可以|解释一下|解释|介绍一下|介绍|讲讲|说说|一下|什么是|是什么|是啥|什么叫|"
+    r"啥是|的原理|吗|呢|呀|啊|\b(?:what is|what are|what's|explain|please|tell me about|can you|the|a|an)\b"
+)
+
+
+def normalize_question(text):
+    """在 normalize_query 的基础上去掉标点和提问套话，只留下问题本身"""
+    text = re.sub(r"[^\w\s]", " ", normalize_query(text))
+    core = re.sub(r"\s+", " ", QUESTION_FILLERS.sub(" ", text)).strip()
+    return core or text.strip()
+
+
+def key_tokens(text):
+    """英文单词、数字与版本号 (v3、0.01、eip1559)：只差一个这样的词，问的就是另一件事"""
+    return set(re.findall(r"[a-z0-9]+(?:\.[0-9]+)*", text))
+
+
+def embed(text, dim=1024):
+    """
+    字符 2/3-gram + 英文单词的哈希向量 (L2 归一化)。
+    中文没有空格分词，用字符 n-gram 衡量字面相似度；对同一概念的换种说法足够区分。
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    compact = text.replace(" ", "")
+    grams = [compact[i:i + n] for n in (2, 3) for i in range(len(compact) - n + 1)]
+    grams += re.findall(r"[a-z0-9]+", text)
+    for gram in grams:
+        vector[zlib.crc32(gram.encode()) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    - 先按归一化后的问题精确匹配，再按余弦相似度 >= threshold 匹配最相近的问题；
+      相似匹配要求两个问题里的英文单词 / 数字 / 版本号完全一致 (V3 与 V4、0.01 与 0.1 不会互相命中)
+    - 每条记录带自己的 TTL：回答用到了价格、新闻等实时工具时 TTL 很短 (或不缓存)
+    - 超过 maxsize 时淘汰最久未命中的条目
+    """
+
+    def __init__(self, threshold=None, ttl=None, maxsize=None):
+        self.threshold = threshold or settings.ANSWER_CACHE_THRESHOLD
+        self.ttl = ttl or settings.ANSWER_CACHE_TTL
+        self.maxsize = maxsize or settings.ANSWER_CACHE_SIZE
+        self._data = OrderedDict()  # 归一化问题 -> (问题向量, 回答, 过期时间)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @staticmethod
+    def cacheable(question):
+        text = normalize_query(question)
+        if len(text) < 2 or any(w in text for w in CONTEXT_WORDS):
+            return False
+        return not CONTEXT_TOKENS.intersection(re.findall(r"[a-z]+", text))
+
+    def lookup(self, question):
+        key = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None and self._data:
+                query = embed(key)
+                keys = list(self._data)
+                scores = np.stack([self._data[k][0] for k in keys]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold and key_tokens(keys[best]) == key_tokens(key):
+                    key, entry = keys[best], self._data[keys[best]]
+            if entry is not None and entry[2] <= now:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def store(self, question, answer, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            self._data[key] = (embed(key), answer, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self):
+        """清空全部回答"""
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+analyst_cache = SemanticCache()
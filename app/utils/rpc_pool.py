@@ -0,0 +1,225 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from web3._utils.batching import sort_batch_response_by_response_ids
+from web3.exceptions import ProviderConnectionError
+from web3.providers.base import JSONBaseProvider
+from app.utils.metrics import span
+from config import settings
+
+# ==========================================
+# RPC 节点池：多个节点 + keep-alive 连接池 + 按延迟选路 + 只读请求对冲 + 熔断
+# ==========================================
+
+# 只读方法：可以同时发给多个节点，谁先返回就用谁 (hedged request)
+READ_METHODS = frozenset({
+    "web3_clientVersion", "net_version", "eth_chainId", "eth_blockNumber", "eth_gasPrice",
+    "eth_maxPriorityFeePerGas", "eth_feeHistory", "eth_getBalance", "eth_getTransactionCount",
+    "eth_getCode", "eth_getStorageAt", "eth_call", "eth_estimateGas", "eth_getLogs",
+    "eth_getBlockByNumber", "eth_getBlockByHash", "eth_getTransactionByHash", "eth_getTransactionReceipt",
+})
+
+# 同一条链上永远不变的结果：第一次查询后缓存。
+# web3 的校验中间件每次 eth_call 前都会查一次 eth_chainId，缓存后只读调用只剩一次往返
+STATIC_METHODS = frozenset({"eth_chainId", "net_version"})
+
+# 对冲请求用的线程池 (所有节点池共用)
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rpc-hedge")
+
+_HEADERS = {"Content-Type": "application/json"}
+
+
+class Endpoint:
+    """
+    一个 RPC 节点：独立的 keep-alive 连接池、延迟 (EWMA) 与熔断状态。
+    - closed：正常使用
+    - open：连续失败 failure_threshold 次后熔断，cooldown 秒内不再使用
+    - half-open：冷却结束后只放一个试探请求，成功则恢复，失败则继续熔断
+    """
+
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, url, timeout, failure_threshold, cooldown):
+        self.url = url
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.latency = None      # 平滑后的响应时间 (秒)，None 表示还没测过
+        self.failures = 0        # 连续失败次数
+        self.opened_at = None    # 熔断开始时间
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def label(self):
+        """只显示协议和主机名，不把 URL 里的 API Key 打到日志里"""
+        parts = urlsplit(self.url)
+        port = f":{parts.port}" if parts.port else ""
+        return f"{parts.scheme}://{parts.hostname}{port}"
+
+    def state(self, now=None):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if (now or time.monotonic()) - self.opened_at >= self.cooldown:
+                return "half_open"
+            return "open"
+
+    def try_probe(self):
+        """半开状态下抢占唯一的试探名额"""
+        with self._lock:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self, elapsed):
+        with self._lock:
+            self.latency = elapsed if self.latency is None else (
+                self.EWMA_ALPHA * elapsed + (1 - self.EWMA_ALPHA) * self.latency
+            )
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"🔌 [RPC] 节点 {self.label} 连续失败 {self.failures} 次，熔断 {self.cooldown:.0f} 秒")
+                self.opened_at = time.monotonic()
+
+    def post(self, payload):
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.url, data=payload, headers=_HEADERS, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            self.record_failure()
+            raise
+        self.record_success(time.perf_counter() - started)
+        return response.content
+
+    def snapshot(self):
+        return {
+            "endpoint": self.label,
+            "state": self.state(),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "failures": self.failures,
+        }
+
+
+class PooledRPCProvider(JSONBaseProvider):
+    """
+    可以替代 Web3.HTTPProvider 的多节点 provider：
+    - 每次按平滑延迟从低到高选择健康节点 (没测过的节点优先，用来摸底)
+    - 只读请求：最快的节点 hedge_delay 秒内没返回，就同时发给下一个节点，取先返回的结果
+    - 写请求 (eth_sendRawTransaction 等)：不对冲，只有连接失败时才换下一个节点
+      (同一笔已签名交易重复广播，链上也只会有一笔)
+    - JSON-RPC 层面的错误 (如合约 revert) 属于正常响应，原样返回，不算节点故障
+    """
+
+    def __init__(self, urls, timeout=None, hedge_delay=None, failure_threshold=None, cooldown=None):
+        super().__init__()
+        if not urls:
+            raise ValueError("PooledRPCProvider 至少需要一个 RPC URL")
+        timeout = timeout or settings.RPC_TIMEOUT
+        failure_threshold = failure_threshold or settings.RPC_FAILURE_THRESHOLD
+        cooldown = settings.RPC_COOLDOWN if cooldown is None else cooldown
+        self.hedge_delay = settings.RPC_HEDGE_DELAY if hedge_delay is None else hedge_delay
+        self.endpoints = [Endpoint(url, timeout, failure_threshold, cooldown) for url in urls]
+        self._static = {}  # 方法名 -> 结果
+
+    def __str__(self):
+        return f"PooledRPCProvider({', '.join(e.label for e in self.endpoints)})"
+
+    @property
+    def stats(self):
+        return [e.snapshot() for e in self.endpoints]
+
+    def _candidates(self):
+        """
+        依次产出要尝试的节点：健康节点按延迟排序，冷却结束的节点排在后面当试探。
+        生成器是惰性的，只有真的轮到某个半开节点时才占用它的试探名额；全部熔断时仍然按顺序硬试一遍。
+        """
+        now = time.monotonic()
+        closed = [e for e in self.endpoints if e.state(now) == "closed"]
+        half_open = [e for e in self.endpoints if e.state(now) == "half_open"]
+        closed.sort(key=lambda e: -1 if e.latency is None else e.latency)
+        yielded = False
+        for endpoint in closed:
+            yielded = True
+            yield endpoint
+        for endpoint in half_open:
+            if endpoint.try_probe():
+                yielded = True
+                yield endpoint
+        if not yielded:
+            yield from sorted(self.endpoints, key=lambda e: e.opened_at or 0)
+
+    def _send(self, payload, hedge):
+        candidates = self._candidates()
+        errors = []
+        if not hedge:
+            for endpoint in candidates:
+                try:
+                    return endpoint.post(payload)
+                except requests.RequestException as e:
+                    errors.append(f"{endpoint.label}: {e}")
+            raise ProviderConnectionError(f"所有 RPC 节点都请求失败: {'; '.join(errors)}")
+
+        pending = {}
+
+        def launch():
+            endpoint = next(candidates, None)
+            if endpoint is not None:
+                pending[_hedge_executor.submit(endpoint.post, payload)] = endpoint
+            return endpoint is not None
+
+        launch()
+        while pending:
+            done, _ = wait(pending, timeout=self.hedge_delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # 最快的节点迟迟不回：再发一份给下一个节点，谁先到用谁
+                launch()
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    return future.result()
+                except requests.RequestException as e:
+                    errors.append(f"{endpoint.label}: {e}")
+            # 这一轮返回的全是失败：立刻补发给下一个节点
+            launch()
+        raise ProviderConnectionError(f"所有 RPC 节点都请求失败: {'; '.join(errors)}")
+
+    def make_request(self, method, params):
+        if method in self._static:
+            return {"jsonrpc": "2.0", "id": 0, "result": self._static[method]}
+        payload = self.encode_rpc_request(method, params)
+        with span("rpc", method):
+            raw = self._send(payload, hedge=method in READ_METHODS)
+        response = self.decode_rpc_response(raw)
+        if method in STATIC_METHODS and "result" in response:
+            self._static[method] = response["result"]
+        return response
+
+    def make_batch_request(self, batch_requests):
+        payload = self.encode_batch_rpc_request(batch_requests)
+        hedge = all(method in READ_METHODS for method, _ in batch_requests)
+        with span("rpc", "batch"):
+            raw = self._send(payload, hedge=hedge)
+        response = self.decode_rpc_response(raw)
+        if not isinstance(response, list):
+            # 整批出错时节点只返回一个错误对象
+            return response
+        return sort_batch_response_by_response_ids(response)
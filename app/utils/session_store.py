@@ -0,0 +1,67 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import settings
+
+
+class SessionRegistry:
+    """
+    会话管理：每个浏览器会话对应一条独立的 LangGraph 线程 (thread_id)。
+    - 超过 idle_ttl 秒没有活动的会话会被回收
+    - 内存中最多保留 max_sessions 个会话，超出时淘汰最久未使用的
+    被回收的会话会通过 on_evict 回调通知调用方 (例如清理 checkpointer 里的历史)。
+    """
+
+    def __init__(self, max_sessions=None, idle_ttl=None, on_evict=None):
+        self.max_sessions = max_sessions or settings.SESSION_MAX_COUNT
+        self.idle_ttl = idle_ttl or settings.SESSION_IDLE_TTL
+        self.on_evict = on_evict
+        self._sessions = OrderedDict()  # session_id -> 最近活跃时间
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def touch(self, session_id=None):
+        """登记一次活动并返回会话 ID；没有传入时自动分配一个新的。"""
+        session_id = session_id or self.new_session_id()
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = now
+            self._sessions.move_to_end(session_id)
+            evicted = self._collect_evictions(now)
+        self._evict(evicted)
+        return session_id
+
+    def sweep(self):
+        """主动清理一次过期会话，返回被清理的数量。"""
+        with self._lock:
+            evicted = self._collect_evictions(time.monotonic())
+        self._evict(evicted)
+        return len(evicted)
+
+    def _collect_evictions(self, now):
+        evicted = []
+        # OrderedDict 按活跃时间排序，最旧的在最前面
+        while self._sessions:
+            oldest_id, last_seen = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - last_seen > self.idle_ttl:
+                self._sessions.popitem(last=False)
+                evicted.append(oldest_id)
+            else:
+                break
+        return evicted
+
+    def _evict(self, session_ids):
+        for session_id in session_ids:
+            print(f"🧹 [会话] 回收闲置会话: {session_id}")
+            if self.on_evict:
+                try:
+                    self.on_evict(session_id)
+                except Exception as e:
+                    print(f"⚠️ [会话] 清理会话 {session_id} 失败: {e}")
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.utils.chain_state import chain_state
+from app.utils.web3_client import Web3Client
+from config import settings
+
+# ==========================================
+# 后端签名交易的提交与回执跟踪：
+# 分配 nonce (本地计数，与按区块缓存的节点 pending nonce 取大) -> 签名广播后立即返回哈希 -> 后台线程批量查询回执
+# 工具和聊天请求都不再等待出块
+# ==========================================
+
+
+class NonceManager:
+    """
+    分配 nonce：取本地计数与节点 pending nonce 中较大的一个。
+    - 本地计数保证连续提交的几笔交易即使还没进节点交易池也不会撞号，不用每笔都查节点
+    - 节点的 pending nonce 走 chain_state 的按区块缓存 (每个区块最多一次 RPC)，
+      同一地址在钱包 (MetaMask) 里签的授权 / 存款交易到下一个区块就会被算进去
+    - 广播失败后 reset()：丢掉本地计数和缓存，下一笔直接向节点重新查询
+    """
+
+    def __init__(self):
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, address):
+        pending = chain_state.pending_nonce(address)
+        with self._lock:
+            nonce = max(self._next.get(address, 0), pending)
+            self._next[address] = nonce + 1
+            return nonce
+
+    def reset(self, address):
+        """广播失败 (nonce 冲突、余额不足等) 后本地计数可能已经不准，下次重新向节点查询"""
+        with self._lock:
+            self._next.pop(address, None)
+        chain_state.invalidate(("nonce", address))
+
+
+class TxManager:
+    """
+    - submit()：补上 nonce、签名、广播，立即返回交易哈希
+    - 后台线程每 poll_interval 秒用一次 JSON-RPC 批量请求查询所有待确认交易的回执
+    - status() / recent()：给查询工具和 /tx 接口读取交易状态
+    """
+
+    def __init__(self, poll_interval=None, history_size=None):
+        self.poll_interval = poll_interval or settings.TX_RECEIPT_POLL_INTERVAL
+        self.history_size = history_size or settings.TX_HISTORY_SIZE
+        self.nonces = NonceManager()
+        self._records = OrderedDict()  # 交易哈希 -> 记录
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    # ---------- 提交 ----------
+    def submit(self, tx, description):
+        """tx 不需要带 nonce；返回 0x 开头的交易哈希"""
+        w3 = Web3Client.get_instance()
+        sender = tx["from"]
+        tx = {**tx, "nonce": self.nonces.allocate(sender)}
+        try:
+            signed_tx = w3.eth.account.sign_transaction(tx, os.getenv("PRIVATE_KEY"))
+            tx_hash = w3.to_hex(w3.eth.send_raw_transaction(signed_tx.raw_transaction))
+        except Exception:
+            self.nonces.reset(sender)
+            raise
+        # 交易已广播：余额、持仓快照的缓存作废
+        chain_state.invalidate_account(sender)
+
+        with self._lock:
+            self._records[tx_hash] = {
+                "hash": tx_hash,
+                "description": description,
+                "from": sender,
+                "nonce": tx["nonce"],
+                "status": "pending",
+                "submitted_at": time.time(),
+                "block": None,
+                "gas_used": None,
+            }
+            while len(self._records) > self.history_size:
+                self._records.popitem(last=False)
+        self._ensure_watcher()
+        self._wakeup.set()
+        return tx_hash
+
+    # ---------- 查询 ----------
+    def status(self, tx_hash):
+        with self._lock:
+            record = self._records.get(tx_hash.lower())
+            return dict(record) if record else None
+
+    def recent(self, limit=5):
+        with self._lock:
+            return [dict(r) for r in list(self._records.values())[-limit:]][::-1]
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for r in self._records.values() if r["status"] == "pending")
+
+    # ---------- 回执跟踪 ----------
+    def _ensure_watcher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="tx-receipt-watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"⚠️ [交易跟踪] 查询回执失败，稍后重试: {e}")
+
+    def _fetch_receipts(self, hashes):
+        """一次批量请求查询多笔交易的回执；provider 不支持批量时逐个查询"""
+        provider = Web3Client.get_instance().provider
+        requests = [("eth_getTransactionReceipt", [h]) for h in hashes]
+        try:
+            responses = provider.make_batch_request(requests)
+        except (AttributeError, NotImplementedError):
+            responses = [provider.make_request(method, params) for method, params in requests]
+        if not isinstance(responses, list):
+            raise RuntimeError(responses.get("error", responses))
+        return [r.get("result") for r in responses]
+
+    def poll_once(self):
+        with self._lock:
+            pending = [h for h, r in self._records.items() if r["status"] == "pending"]
+        if not pending:
+            return 0
+        confirmed = 0
+        for tx_hash, receipt in zip(pending, self._fetch_receipts(pending)):
+            if not receipt:
+                continue
+            with self._lock:
+                record = self._records.get(tx_hash)
+                if record is None:
+                    continue
+                record["status"] = "success" if int(receipt["status"], 16) == 1 else "failed"
+                record["block"] = int(receipt["blockNumber"], 16)
+                record["gas_used"] = int(receipt["gasUsed"], 16)
+            confirmed += 1
+            icon = "✅" if record["status"] == "success" else "❌"
+            print(f"{icon} [交易跟踪] {record['description']} 已上链 (区块 #{record['block']}): {tx_hash}")
+        return confirmed
+
+
+tx_manager = TxManager()
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from web3 import Web3
 from dotenv import load_dotenv
+from app.utils.rpc_pool import PooledRPCProvider
 
 # --- 路径锁定 ---
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -23,15 +24,20 @@ class Web3Client:
             if not rpc_url:
                 # 如果找不到，尝试读取旧名字作为兼容（防止你忘了改 .env）
                 rpc_url = os.getenv("INFURA_URL") or os.getenv("ALCHEMY_RPC_URL")
+
+            # 多个节点用逗号分隔写在 RPC_URLS 里，节点池会自动选最快的健康节点
+            rpc_urls = [u.strip() for u in os.getenv("RPC_URLS", "").split(",") if u.strip()]
+            if not rpc_urls and rpc_url:
+                rpc_urls = [rpc_url]
             
-            if not rpc_url:
-                raise ValueError(f"❌ 未找到 RPC_URL！请检查 .env 文件中是否有 RPC_URL=... 配置")
+            if not rpc_urls:
+                raise ValueError(f"❌ 未找到 RPC_URL！请检查 .env 文件中是否有 RPC_URLS=... 或 RPC_URL=... 配置")
             
-            cls._instance = Web3(Web3.HTTPProvider(rpc_url))
+            cls._instance = Web3(PooledRPCProvider(rpc_urls))
             
             # 简单测试一下连接是否成功
             if not cls._instance.is_connected():
-                raise ConnectionError("❌ 无法连接到区块链网络，请检查 RPC_URL 是否有效 (可能是 Alchemy Key 过期或网络问题)")
+                raise ConnectionError("❌ 无法连接到区块链网络，请检查 RPC_URL(S) 是否有效 (可能是 Alchemy Key 过期或网络问题)")
                 
         return cls._instance
 
@@ -0,0 +1,208 @@
+"""
+离线基准用的替身：脚本化的假聊天模型、本地桩工具与桩 web3 provider。
+所有替身都按固定延迟 sleep，用来模拟 OpenAI / CoinGecko / DuckDuckGo / RPC 的网络耗时。
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from web3.providers.base import BaseProvider
+
+from app.agents.fast_router import AGENT_TAGS, classify_intents
+
+# 用户消息里的关键词 -> 假模型优先调用的工具
+TOOL_KEYWORDS = (
+    (("余额", "balance"), "get_balance"),
+    (("授权", "approve"), "approve_weth_to_aave"),
+    (("兑换", "wrap", "swap"), "swap_eth_to_weth"),
+    (("存", "deposit"), "deposit_weth_to_aave"),
+    (("价格", "多少钱", "price"), "get_token_price"),
+    (("新闻", "消息", "news"), "get_crypto_news"),
+)
+# 工具参数的占位取值；没列出的参数用用户原话
+ARG_VALUES = {"amount_str": "0.01", "symbol": "eth"}
+
+
+class LLMStats:
+    """累计调用次数与 token 数 (输入 + 输出，按 count_tokens_approximately 估算)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens, output_tokens):
+        with self._lock:
+            self.calls += 1
+            self.tokens += prompt_tokens + output_tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": self.calls, "tokens": self.tokens}
+
+
+def _last_human(messages):
+    return next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    按脚本回答的假模型：
+    - 绑定了工具且还没拿到工具结果：按用户原话里的关键词挑出工具 (可能多个) 在同一步发起调用
+    - 已经拿到工具结果：把这一步的全部结果包进最终回答 (交易 JSON 原样保留)
+    - with_structured_output (经理路由)：子 Agent 已回复就 FINISH，否则按关键词分派
+    """
+
+    latency: float = 0.0
+    stats: LLMStats
+
+    @property
+    def _llm_type(self):
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        schemas = [convert_to_openai_tool(t)["function"] for t in tools]
+        return self.bind(tool_schemas=schemas)
+
+    def with_structured_output(self, schema, **kwargs):
+        def decide(prompt):
+            # 只看最新一条用户消息及其之后的回复
+            text = str(prompt)
+            tail = text[text.rfind("HumanMessage("):]
+            question, _, replies = tail.partition("AIMessage(")
+            intents = classify_intents(question)
+            if AGENT_TAGS["executor"] in replies:
+                return "FINISH"
+            if AGENT_TAGS["analyst"] in replies:
+                return "executor" if "executor" in intents else "FINISH"
+            if "analyst" in intents:
+                return "analyst"
+            return "executor" if intents else "FINISH"
+
+        def route(prompt):
+            time.sleep(self.latency)
+            self.stats.record(count_tokens_approximately([str(prompt)]), 8)
+            return schema(next_agent=decide(prompt))
+
+        async def aroute(prompt):
+            await asyncio.sleep(self.latency)
+            self.stats.record(count_tokens_approximately([str(prompt)]), 8)
+            return schema(next_agent=decide(prompt))
+
+        return RunnableLambda(route, afunc=aroute)
+
+    def _reply(self, messages, tool_schemas=None):
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            results = []
+            for message in reversed(messages):
+                if not isinstance(message, ToolMessage):
+                    break
+                results.append(message.content if isinstance(message.content, str) else str(message.content))
+            content = "\n".join(reversed(results))
+            if '"type": "transaction"' in content:
+                return AIMessage(content=f"请在钱包中确认这笔交易。 {content}")
+            return AIMessage(content=f"根据查询结果：{content[:300]}")
+        if tool_schemas:
+            question = _last_human(messages)
+            names = [s["name"] for s in tool_schemas]
+            # 命中几个工具就在同一步里一起调用 (与 GPT-4o 的 parallel tool calls 一致)
+            matched = [
+                tool for words, tool in TOOL_KEYWORDS if tool in names and any(w in question.lower() for w in words)
+            ] or names[:1]
+            calls = []
+            for i, name in enumerate(matched):
+                schema = tool_schemas[names.index(name)]
+                args = {arg: ARG_VALUES.get(arg, question) for arg in schema.get("parameters", {}).get("properties", {})}
+                calls.append({"name": name, "args": args, "id": f"call_{time.monotonic_ns()}_{i}"})
+            return AIMessage(content="", tool_calls=calls)
+        # 没有工具 (记忆压缩等)：给一段固定长度的摘要
+        return AIMessage(content="用户关注 ETH 行情与 Aave 存款流程，已查询过余额与价格。")
+
+    def _result(self, messages, tool_schemas):
+        message = self._reply(messages, tool_schemas)
+        output_tokens = count_tokens_approximately([message]) if message.content else 20
+        self.stats.record(count_tokens_approximately(messages), output_tokens)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tool_schemas=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result(messages, tool_schemas)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tool_schemas=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result(messages, tool_schemas)
+
+
+def stub_tool(real_tool, delay, result):
+    """与真实工具同名、同参数说明的本地桩，sleep delay 秒后返回固定结果"""
+
+    def run(**kwargs):
+        time.sleep(delay)
+        return result(**kwargs) if callable(result) else result
+
+    return StructuredTool.from_function(
+        func=run,
+        name=real_tool.name,
+        description=real_tool.description,
+        args_schema=real_tool.args_schema,
+    )
+
+
+def stub_analyst_tools(delay):
+    from app.tools.market_tool import get_token_price
+    from app.tools.news_tool import get_crypto_news
+    from app.tools.rag_tool import query_knowledge_base
+
+    return [
+        stub_tool(get_token_price, delay, lambda symbol="ethereum": json.dumps({s: 3000.0 for s in symbol.split(",")})),
+        stub_tool(get_crypto_news, delay, lambda query: f"{query}：以太坊 ETF 资金持续流入，链上活跃度回升。"),
+        stub_tool(query_knowledge_base, delay, lambda query: "Uniswap V3 的集中流动性允许 LP 在价格区间内提供流动性。"),
+    ]
+
+
+class StubProvider(BaseProvider):
+    """只回答执行官工具会用到的几个 JSON-RPC 方法，每次请求 sleep delay 秒"""
+
+    RESULTS = {
+        "eth_chainId": hex(11155111),
+        "eth_blockNumber": hex(7_000_000),
+        "eth_gasPrice": hex(2 * 10**9),
+        "eth_getBalance": hex(5 * 10**17),
+        "eth_getTransactionCount": hex(7),
+        "eth_estimateGas": hex(60_000),
+        "eth_call": "0x" + "00" * 32,
+        "eth_sendRawTransaction": "0x" + "ab" * 32,
+    }
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.requests = 0
+
+    def make_request(self, method, params):
+        time.sleep(self.delay)
+        self.requests += 1
+        if method == "eth_getTransactionReceipt":
+            result = {
+                "transactionHash": params[0], "blockHash": "0x" + "cd" * 32, "blockNumber": hex(7_000_001),
+                "transactionIndex": "0x0", "from": "0x" + "11" * 20, "to": "0x" + "22" * 20,
+                "status": "0x1", "gasUsed": hex(50_000), "cumulativeGasUsed": hex(50_000),
+                "effectiveGasPrice": hex(2 * 10**9), "logs": [], "logsBloom": "0x" + "00" * 256,
+                "contractAddress": None, "type": "0x0",
+            }
+        else:
+            result = self.RESULTS.get(method)
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+    def is_connected(self, show_traceback=False):
+        return True
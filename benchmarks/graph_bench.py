@@ -0,0 +1,126 @@
+"""
+多 Agent 图的离线延迟基准：不访问 OpenAI / CoinGecko / DuckDuckGo / RPC。
+用脚本化的假模型、本地桩工具和桩 web3 provider 跑完整的 fund_manager 图，
+按固定比例回放分析师 / 执行官 / 闲聊 / 混合对话，每一步的网络耗时用 --*-delay 模拟。
+
+输出：端到端延迟 p50/p95 (整体与按对话类型)、每轮 LLM 调用次数、每轮 token 数、N 个并发会话下的吞吐。
+路由、缓存等改动前后各跑一次即可对比。
+
+用法:
+    python -m benchmarks.graph_bench                       # 8 个并发会话，每个会话跑 2 遍剧本
+    python -m benchmarks.graph_bench --sessions 32 --llm-delay 0.5 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+
+# 图在导入时会创建 ChatOpenAI，只需要一个占位 key，基准不会真的请求 OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+# 对话剧本：每个会话按顺序发送这些消息
+SCRIPTS = {
+    "analyst": [
+        "ETH 现在的价格是多少？", "最近有什么以太坊新闻？", "解释一下 Uniswap V3 的集中流动性原理",
+        "看看 ETH 价格和最新新闻",
+    ],
+    "executor": ["查一下我的钱包余额", "帮我授权 WETH 给 Aave", "存 0.01 WETH 到 Aave"],
+    "small_talk": ["你好", "谢谢，辛苦了"],
+    "mixed": ["先帮我分析一下 ETH 走势，然后查一下我的余额"],
+}
+# 并发会话里各类剧本的占比 (按顺序循环分配)
+MIX = ["analyst", "executor", "analyst", "small_talk", "executor", "mixed"]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def build_wrapper(llm_delay, tool_delay, rpc_delay, answer_cache=True, checkpointer="memory"):
+    """用假模型 + 桩工具组装一个与线上结构完全相同的 MultiAgentWrapper"""
+    from langgraph.checkpoint.memory import MemorySaver
+    from web3 import Web3
+    from app.agents.fund_manager import MultiAgentWrapper, build_app_graph
+    from app.utils.checkpoint_store import SQLiteCheckpointer
+    from app.utils.response_cache import SemanticCache
+    from app.utils.web3_client import Web3Client
+    from benchmarks.fakes import LLMStats, ScriptedChatModel, StubProvider, stub_analyst_tools
+
+    # 执行官用真实工具，链上请求全部落到桩 provider
+    provider = StubProvider(delay=rpc_delay)
+    Web3Client._instance = Web3(provider)
+
+    stats = LLMStats()
+    model = ScriptedChatModel(latency=llm_delay, stats=stats)
+    graph = build_app_graph(
+        model=model,
+        tools={"analyst": stub_analyst_tools(tool_delay)},
+        checkpointer=MemorySaver() if checkpointer == "memory" else SQLiteCheckpointer(path=_temp_db()),
+        answer_cache=SemanticCache() if answer_cache else None,
+    )
+    return MultiAgentWrapper(graph=graph), stats, provider
+
+
+def _temp_db():
+    import tempfile
+    from pathlib import Path
+
+    return Path(tempfile.mkdtemp(prefix="graph-bench-")) / "checkpoints.sqlite"
+
+
+async def run_session(wrapper, kind, rounds, samples):
+    session_id = None
+    for _ in range(rounds):
+        for message in SCRIPTS[kind]:
+            started = time.perf_counter()
+            result = await wrapper.ainvoke({"input": message, "session_id": session_id})
+            samples[kind].append(time.perf_counter() - started)
+            session_id = result["session_id"]
+
+
+async def run(sessions, rounds, llm_delay, tool_delay, rpc_delay, answer_cache=True, checkpointer="memory"):
+    wrapper, stats, provider = build_wrapper(llm_delay, tool_delay, rpc_delay, answer_cache, checkpointer)
+    samples = defaultdict(list)
+    kinds = [MIX[i % len(MIX)] for i in range(sessions)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(wrapper, kind, rounds, samples) for kind in kinds))
+    elapsed = time.perf_counter() - started
+
+    latencies = [s for values in samples.values() for s in values]
+    turns = len(latencies)
+    usage = stats.snapshot()
+    print(
+        f"\n{sessions} 个并发会话, 每个剧本 {rounds} 遍, "
+        f"延迟: LLM {llm_delay * 1000:.0f}ms / 工具 {tool_delay * 1000:.0f}ms / RPC {rpc_delay * 1000:.0f}ms"
+    )
+    print(f"{'scenario':<12}{'turns':>7}{'p50 ms':>10}{'p95 ms':>10}")
+    for kind in SCRIPTS:
+        if samples[kind]:
+            values = samples[kind]
+            print(f"{kind:<12}{len(values):>7}{percentile(values, 50) * 1000:>10.0f}{percentile(values, 95) * 1000:>10.0f}")
+    print(f"{'all':<12}{turns:>7}{percentile(latencies, 50) * 1000:>10.0f}{percentile(latencies, 95) * 1000:>10.0f}")
+    print(f"LLM 调用/轮: {usage['calls'] / turns:.2f}   tokens/轮: {usage['tokens'] / turns:.0f}   RPC 请求: {provider.requests}")
+    print(f"吞吐: {turns / elapsed:.2f} 轮/秒 (总耗时 {elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多 Agent 图离线延迟基准")
+    parser.add_argument("--sessions", type=int, default=8, help="并发会话数")
+    parser.add_argument("--rounds", type=int, default=2, help="每个会话重复剧本的遍数")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="每次 LLM 调用的模拟耗时 (秒)")
+    parser.add_argument("--tool-delay", type=float, default=0.1, help="每次分析师工具调用的模拟耗时 (秒)")
+    parser.add_argument("--rpc-delay", type=float, default=0.05, help="每个 JSON-RPC 请求的模拟耗时 (秒)")
+    parser.add_argument("--no-answer-cache", action="store_true", help="关闭分析师回复的语义缓存")
+    parser.add_argument("--checkpointer", choices=["memory", "sqlite"], default="memory", help="检查点存储")
+    args = parser.parse_args()
+    asyncio.run(run(
+        args.sessions, args.rounds, args.llm_delay, args.tool_delay, args.rpc_delay,
+        not args.no_answer_cache, args.checkpointer,
+    ))
@@ -0,0 +1,83 @@
+"""
+知识库检索基准：在一小组带标注的问题上比较各检索方式的 recall@k 与 MRR。
+
+标注方式：每个问题给出若干"相关片段关键词"，段落 (忽略大小写) 包含任意一个即视为相关。
+对比的检索方式：dense (纯向量) / bm25 / hybrid (RRF 融合) / hybrid+rerank (融合后重排)。
+
+用法:
+    python -m benchmarks.rag_recall                  # 使用 chroma_db 中的真实向量库
+    python -m benchmarks.rag_recall --fake-embeddings # 离线：临时库 + 确定性假向量 (只看 BM25 与重排的效果)
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+QUERIES_FILE = Path(__file__).resolve().parent / "rag_queries.json"
+
+
+def _is_relevant(doc, phrases):
+    text = " ".join(doc.page_content.lower().split())
+    return any(p.lower() in text for p in phrases)
+
+
+def _offline_vectorstore():
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from app.tools.rag_ingest import DOCS_DIR, _parse_all
+    from langchain_core.documents import Document
+
+    store = Chroma(
+        collection_name="rag_bench",
+        embedding_function=DeterministicFakeEmbedding(size=256),
+        persist_directory=tempfile.mkdtemp(prefix="rag_bench_"),
+    )
+    parsed = _parse_all(sorted(DOCS_DIR.rglob("*.pdf")))
+    docs = [Document(page_content=text, metadata=meta) for chunks in parsed.values() for text, meta in chunks]
+    store.add_documents(docs)
+    return store
+
+
+def run(k, pool, fake_embeddings):
+    from app.tools.hybrid_retriever import HybridRetriever
+
+    if fake_embeddings:
+        vectorstore = _offline_vectorstore()
+    else:
+        from app.tools.rag_tool import get_vectorstore
+        vectorstore = get_vectorstore()
+
+    retriever = HybridRetriever(vectorstore, index_version=lambda: 0, candidate_pool=pool, top_k=k)
+    modes = {
+        "dense": lambda q: retriever.dense_search(q, k),
+        "bm25": lambda q: retriever.sparse_search(q, k),
+        "hybrid": lambda q: retriever.fused_search(q, k)[:k],
+        "hybrid+rerank": lambda q: retriever.search(q, k),
+    }
+    labeled = json.loads(QUERIES_FILE.read_text(encoding="utf-8"))
+
+    print(f"{len(labeled)} 个问题, k={k}, 候选池={pool}, 向量={'假向量' if fake_embeddings else '真实向量'}")
+    print(f"{'mode':<15}{'recall@k':>10}{'MRR':>8}{'avg ms':>10}")
+    for name, search in modes.items():
+        hits = 0
+        rr = 0.0
+        started = time.perf_counter()
+        for item in labeled:
+            results = search(item["query"])
+            ranks = [i for i, doc in enumerate(results) if _is_relevant(doc, item["relevant"])]
+            if ranks:
+                hits += 1
+                rr += 1.0 / (ranks[0] + 1)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(labeled)
+        print(f"{name:<15}{hits / len(labeled):>10.2f}{rr / len(labeled):>8.2f}{elapsed_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="知识库检索 recall@k 基准")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--pool", type=int, default=20)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+    run(args.k, args.pool, args.fake_embeddings)
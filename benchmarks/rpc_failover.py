@@ -0,0 +1,98 @@
+"""
+RPC 节点池基准：在本机起几个桩 JSON-RPC 服务 (快 / 慢 / 偶发卡顿 / 返回 503 / 端口不通)，
+对比单节点与节点池下 eth_getBalance 的延迟，并打印每个节点最终的熔断状态。
+
+用法:
+    python -m benchmarks.rpc_failover
+    python -m benchmarks.rpc_failover --requests 200 --hedge-delay 0.1
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ADDRESS = "0xF467257a991351317A76ed5a115f7fAD525231f4"
+
+
+def start_stub(delay=0.0, stall_rate=0.0, stall=1.0, status=200):
+    """起一个桩 JSON-RPC 服务：每次请求 sleep delay 秒，按 stall_rate 概率额外卡顿 stall 秒"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(delay + (stall if random.random() < stall_rate else 0.0))
+            requests = request if isinstance(request, list) else [request]
+            results = [{"jsonrpc": "2.0", "id": r["id"], "result": hex(10**18)} for r in requests]
+            body = json.dumps(results if isinstance(request, list) else results[0]).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def measure(name, urls, n, hedge_delay):
+    from web3 import Web3
+    from app.utils.rpc_pool import PooledRPCProvider
+
+    provider = PooledRPCProvider(urls, timeout=2, hedge_delay=hedge_delay, failure_threshold=2, cooldown=60)
+    w3 = Web3(provider)
+    latencies = []
+    errors = 0
+    for _ in range(n):
+        started = time.perf_counter()
+        try:
+            w3.eth.get_balance(ADDRESS)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    print(f"{name:<34}{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 95) * 1000:>9.1f}{errors:>8}")
+    for stat in provider.stats:
+        print(f"    {stat['endpoint']:<26}{stat['state']:<10} latency={stat['latency_ms']}ms failures={stat['failures']}")
+
+
+def run(n, hedge_delay):
+    random.seed(7)
+    fast = start_stub(delay=0.01)
+    slow = start_stub(delay=0.3)
+    jittery = start_stub(delay=0.01, stall_rate=0.2, stall=1.0)
+    erroring = start_stub(status=503)
+    down = closed_port_url()
+
+    print(f"{n} 次 eth_getBalance, 对冲等待 {hedge_delay * 1000:.0f}ms")
+    print(f"{'scenario':<34}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    measure("single slow node", [slow], n, hedge_delay)
+    measure("single jittery node", [jittery], n, hedge_delay)
+    measure("pool: slow + fast", [slow, fast], n, hedge_delay)
+    measure("pool: jittery + fast (hedged)", [jittery, fast], n, hedge_delay)
+    measure("pool: down + 503 + fast", [down, erroring, fast], n, hedge_delay)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RPC 节点池延迟与故障切换基准")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--hedge-delay", type=float, default=0.1)
+    args = parser.parse_args()
+    run(args.requests, args.hedge_delay)
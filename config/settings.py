@@ -1,5 +1,7 @@
 # config/settings.py
 # config/settings.py
+import os
+
 MY_ADDRESS = "0xF467257a991351317A76ed5a115f7fAD525231f4"  
 
 # 2. 网络配置 (Sepolia)
@@ -8,6 +10,8 @@ SEPOLIA_CHAIN_ID = 11155111
 # 3. 合约地址 
 WETH_ADDRESS = "0xfFf9976782d46CC05630D1f6eBAb18b2324d6B14"
 AAVE_POOL_ADDRESS = "0x6Ae43d3271ff6888e7Fc43Fd7321a503ff738951"
+# Multicall3 (各条链上地址相同)：把多次只读调用合并成一次 eth_call
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
 
 # 4. ABI 定义 
 # config/settings.py (找到 WETH_ABI 并替换)
@@ -44,4 +48,115 @@ AAVE_ABI = [{
     "outputs": [],
     "stateMutability": "nonpayable",
     "type": "function"
-}]
\ No newline at end of file
+}]
+
+# 5. 服务并发配置 (可通过环境变量覆盖)
+
+# 同时执行的 Agent 图数量上限 (每个请求独占一个名额)
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "4"))
+# 排队等待的请求数上限，超过后直接返回 503
+AGENT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "16"))
+# 排队最长等待秒数，超时同样返回 503
+AGENT_QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "30"))
+
+# 6. 会话配置
+# 内存中最多同时保留的会话 (LangGraph 线程) 数量
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+# 会话闲置多少秒后被回收
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+
+# 7. 对话历史压缩配置
+# 每次发给经理 / 子 Agent 的近期对话最多占用的 token 数
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+# 原样保留的最近对话轮数 (一轮 = 一条用户消息 + 之后的所有回复)
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "4"))
+
+# 8. 行情缓存配置
+# 币价缓存的新鲜时间 (秒)
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "30"))
+# 过期后仍可先返回旧值、后台刷新的时间窗口 (秒)
+PRICE_STALE_TTL = float(os.getenv("PRICE_STALE_TTL", "120"))
+
+# 9. ETH 历史相似走势 (analog) 后台刷新间隔 (秒)
+ANALOG_REFRESH_INTERVAL = float(os.getenv("ANALOG_REFRESH_INTERVAL", "3600"))
+# 刷新失败后的重试间隔 (秒)
+ANALOG_RETRY_INTERVAL = float(os.getenv("ANALOG_RETRY_INTERVAL", "60"))
+# 相似走势搜索参数：探针天数 / 向后观察天数 / 窗口步长 (1 = 完全重叠的窗口) / 提示词里给出前几段互不重叠的相似走势
+ANALOG_PROBE_LEN = int(os.getenv("ANALOG_PROBE_LEN", "5"))
+ANALOG_HORIZON = int(os.getenv("ANALOG_HORIZON", "5"))
+ANALOG_STRIDE = int(os.getenv("ANALOG_STRIDE", "1"))
+ANALOG_TOP_K = int(os.getenv("ANALOG_TOP_K", "3"))
+
+# 10. 知识库检索缓存
+# 检索结果缓存时间 (秒)；重新入库后自动失效
+RAG_RESULT_TTL = float(os.getenv("RAG_RESULT_TTL", "300"))
+# 查询向量内存缓存条数 (同时持久化在 chroma_db 目录下的 SQLite 里)
+RAG_EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", "2048"))
+# 混合检索：最终返回的段落数 / 向量与 BM25 各自召回的候选数
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+RAG_CANDIDATE_POOL = int(os.getenv("RAG_CANDIDATE_POOL", "20"))
+# 可选的本地 cross-encoder 重排模型 (需安装 sentence-transformers)；留空则使用轻量重排
+RAG_RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "")
+
+# 11. RPC 节点池
+# 单个 JSON-RPC 请求的超时 (秒)
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+# 只读请求在最快节点上等待多久没有响应，就同时向下一个节点再发一份 (hedged request，秒)
+RPC_HEDGE_DELAY = float(os.getenv("RPC_HEDGE_DELAY", "0.3"))
+# 连续失败多少次后熔断该节点 / 熔断后多久再放一个请求试探 (秒)
+RPC_FAILURE_THRESHOLD = int(os.getenv("RPC_FAILURE_THRESHOLD", "3"))
+RPC_COOLDOWN = float(os.getenv("RPC_COOLDOWN", "30"))
+
+# 12. 链上状态缓存：后台查询最新区块号的间隔 (秒)
+# 同一区块内的 gas 价格、nonce、余额、持仓快照等读取直接命中缓存 (Sepolia 约 12 秒出一个块)
+BLOCK_POLL_INTERVAL = float(os.getenv("BLOCK_POLL_INTERVAL", "4"))
+
+# 13. 后端签名交易的回执跟踪
+# 后台批量查询待确认交易回执的间隔 (秒)
+TX_RECEIPT_POLL_INTERVAL = float(os.getenv("TX_RECEIPT_POLL_INTERVAL", "4"))
+# 内存中保留的最近交易记录条数
+TX_HISTORY_SIZE = int(os.getenv("TX_HISTORY_SIZE", "200"))
+
+# 14. 分析师回复的语义缓存
+# 问题相似度 (0~1) 达到阈值即复用上次的回答
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+# 概念类回答的缓存时间 (秒) / 最多缓存的问题数
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+# 回答用到了价格、新闻等实时工具时的缓存时间 (秒)，设为 0 则这类回答不缓存
+ANSWER_CACHE_VOLATILE_TTL = float(os.getenv("ANSWER_CACHE_VOLATILE_TTL", "30"))
+
+# 15. 分析师工具调用超时 (秒)
+# 同一步里的多个工具并发执行，单个工具超时后跳过它，用其余结果继续回答
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+# 按工具单独设置，格式 "工具名=秒数,工具名=秒数"
+TOOL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (
+        item.partition("=")
+        for item in os.getenv("TOOL_TIMEOUTS", "get_token_price=10,get_crypto_news=15,query_knowledge_base=20").split(",")
+    )
+    if name.strip() and seconds.strip()
+}
+# 同步工具调用的线程数：每个并发请求一步最多同时调用 3 个分析师工具，再给超时后仍在后台收尾的调用留出余量
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", str(AGENT_MAX_CONCURRENCY * 4)))
+
+# 16. 新闻检索
+# 同一 (归一化后的) 搜索词的结果缓存时间 (秒) / 过期后先返回旧值、后台刷新的时间窗口 (秒)
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "300"))
+NEWS_STALE_TTL = float(os.getenv("NEWS_STALE_TTL", "600"))
+# 每次从 DuckDuckGo 拉取的条数 / 交给模型的新闻最多占用的 token 数
+NEWS_MAX_RESULTS = int(os.getenv("NEWS_MAX_RESULTS", "12"))
+NEWS_TOKEN_BUDGET = int(os.getenv("NEWS_TOKEN_BUDGET", "500"))
+
+# 17. 对话检查点存储
+# sqlite：落盘，多个 worker 进程共用同一个文件；memory：只保存在当前进程内存里
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+# 数据库文件路径，留空则使用 app/database/checkpoints.sqlite
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "")
+# 每个会话只保留最近多少个检查点
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+# 任务中间写入 (put_writes) 缓冲区的后台提交间隔 (秒)；检查点本身 (put) 立即提交
+CHECKPOINT_FLUSH_INTERVAL = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL", "0.2"))
+# 序列化后超过多少字节的数据做 zlib 压缩
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "512"))
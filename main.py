@@ -21,6 +21,7 @@ def main():
         print(Fore.GREEN + "\n✅ 系统就绪！")
         print(Fore.WHITE + "你可以对我说：'把 0.0001 WETH 存入 Aave' 或 '帮我理财'")
         print(Style.DIM + "--------------------------------------------------")
+        session_id = None  # 整个命令行对话共用一个会话
 
         # 4. 进入对话循环
         while True:
@@ -41,8 +42,9 @@ def main():
             # ---  LangChain 接管 ---
             # run() 方法自动分析决定是用工具还是只聊天
             try:
-                result = agent.invoke({"input": user_input})
+                result = agent.invoke({"input": user_input, "session_id": session_id})
                 response = result["output"]
+                session_id = result["session_id"]
                 print(Fore.CYAN + f"🤖 Agent: {response}")
             except Exception as e:
                 print(Fore.RED + f"❌ 执行过程中出错: {e}")
@@ -1,14 +1,30 @@
 import uvicorn
 import os
+import json
+import time
 from pathlib import Path # 👈 引入这个神器
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.agents.fund_manager import create_fund_manager
+from app.utils.agent_pool import AgentPool, AgentBusyError
+from app.tools.rag_tool import warm_up_in_background, knowledge_base_status
+from app.agents.fast_router import router_stats
+from app.utils.chain_state import chain_state
+from app.utils.tx_manager import tx_manager
+from app.utils.response_cache import analyst_cache
+from app.utils.metrics import registry, request_seconds, start_trace, current_trace
+
+@asynccontextmanager
+async def lifespan(app):
+    # 端口已经开始监听后再在后台预热知识库，冷启动不再被 PDF 向量化卡住
+    warm_up_in_background()
+    yield
 
 # 1. 初始化 FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 2. 允许跨域
 app.add_middleware(
@@ -32,7 +48,34 @@ print(f"👀 是否存在? {css_path.exists()}")
 print("🚀 正在启动 Agent，请稍候...")
 # 注意：这里我们只初始化一次，避免每次请求都重新连接区块链
 agent_executor = create_fund_manager()
-print("✅ Agent 就绪！")
+# 限制同时运行的 Agent 数量与排队长度，满了直接 503，不把服务器拖死
+agent_pool = AgentPool()
+print(f"✅ Agent 就绪！(并发上限 {agent_pool.max_concurrency}，排队上限 {agent_pool.max_queue})")
+
+# /metrics 里除了耗时直方图，再带上几个实时状态
+registry.gauge("agent_pool_running", "Agent graphs currently running", lambda: agent_pool.stats["running"])
+registry.gauge("agent_pool_waiting", "Requests waiting for an agent slot", lambda: agent_pool.stats["waiting"])
+registry.gauge("router_fast_hit_ratio", "Share of routing decisions made without an LLM call", lambda: router_stats.hit_rate)
+registry.gauge("chain_state_block", "Latest block number seen by the block poller", lambda: chain_state._block)
+registry.gauge("chain_state_cache_hits", "Chain reads served from the block-keyed cache", lambda: chain_state.hits)
+registry.gauge("chain_state_cache_misses", "Chain reads that reached the RPC", lambda: chain_state.misses)
+registry.gauge("tx_pending", "Submitted transactions still waiting for a receipt", lambda: tx_manager.pending_count)
+registry.gauge("analyst_answer_cache_hits", "Analyst questions answered from the semantic cache", lambda: analyst_cache.hits)
+registry.gauge("analyst_answer_cache_misses", "Analyst questions that went to the LLM", lambda: analyst_cache.misses)
+registry.gauge("analyst_answer_cache_entries", "Answers currently held in the semantic cache", lambda: len(analyst_cache))
+
+@app.middleware("http")
+async def trace_chat_requests(request: Request, call_next):
+    """/chat 系列接口：每个请求一条追踪 (前端可用 X-Trace-Id 头指定 ID)，ID 放在响应头里返回"""
+    if not request.url.path.startswith("/chat"):
+        return await call_next(request)
+    with start_trace(request.headers.get("X-Trace-Id")) as trace:
+        response = await call_next(request)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    # 流式接口的总耗时在推流结束时再记
+    if request.url.path == "/chat":
+        request_seconds.observe(time.perf_counter() - trace.started, "/chat")
+    return response
 
 # 4. 挂载静态文件 (使用绝对路径)
 # 这样不管你在哪里运行 python 命令，它都能精准找到文件
@@ -50,6 +93,25 @@ async def read_root():
 async def read_eth_price():
     return FileResponse(BASE_DIR / 'eth-price.html')
 
+@app.get("/ready")
+async def ready():
+    # 服务本身能响应就说明 Agent 已就绪；知识库可能还在后台预热
+    kb = knowledge_base_status()
+    return {"ready": kb["ready"], "agent": True, "knowledge_base": kb}
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus 文本格式：各节点 / LLM / 工具 / RPC / CoinGecko 的耗时直方图
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/tx/{tx_hash}")
+async def tx_status(tx_hash: str):
+    # 后端签名的交易提交后立即返回哈希，前端用它轮询确认结果
+    record = tx_manager.status(tx_hash)
+    if record is None:
+        return JSONResponse(status_code=404, content={"error": "unknown transaction"})
+    return record
+
 @app.post("/chat")
 async def chat(request: Request):
     try:
@@ -60,17 +122,83 @@ async def chat(request: Request):
             return {"answer": "尴尬了，没收到消息..."}
 
         user_input = messages[-1]['content']
-        print(f"📩 收到指令: {user_input}")
+        # 会话 ID：前端放在请求体或 X-Session-Id 头里，没有就由后端新分配
+        session_id = data.get("session_id") or request.headers.get("X-Session-Id")
+        print(f"📩 收到指令: {user_input} (会话: {session_id or '新会话'})")
 
-        # 调用 Agent
-        result = agent_executor.invoke({"input": user_input})
+        # 调用 Agent (异步执行，慢请求不会阻塞静态文件和其他用户)
+        result = await agent_pool.run(agent_executor.ainvoke, {"input": user_input, "session_id": session_id})
         ai_response = result["output"]
 
-        return {"answer": ai_response}
+        trace = current_trace()
+        response = {"answer": ai_response, "session_id": result["session_id"], "trace_id": trace.trace_id}
+        # 请求体带 "trace": true 时附上本次请求的耗时明细
+        if data.get("trace"):
+            response["trace"] = trace.to_dict()
+        return response
+
+    except AgentBusyError as e:
+        print(f"⏳ 请求被拒绝: {e}")
+        return JSONResponse(status_code=503, content={"answer": f"服务繁忙，请稍后再试 ({e})"})
+    except Exception as e:
+        print(f"❌ 报错: {e}")
+        return {"answer": f"Agent Error: {str(e)}"}
+
+def _sse(event):
+    """按 Server-Sent Events 格式打包一个事件"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
 
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    # 请求体解析失败 (不是 JSON、缺字段) 时和 /chat 一样返回错误信息，而不是裸 500
+    try:
+        data = await request.json()
+        messages = data.get("messages", [])
+        if not messages:
+            return {"answer": "尴尬了，没收到消息..."}
+        user_input = messages[-1]['content']
     except Exception as e:
         print(f"❌ 报错: {e}")
         return {"answer": f"Agent Error: {str(e)}"}
 
+    session_id = data.get("session_id") or request.headers.get("X-Session-Id")
+    print(f"📩 收到流式指令: {user_input} (会话: {session_id or '新会话'})")
+
+    # 排队已满时直接返回 503；这里只检查、不占名额
+    if agent_pool.full:
+        print("⏳ 请求被拒绝: Agent 正忙，排队人数已满")
+        return JSONResponse(status_code=503, content={"answer": "服务繁忙，请稍后再试 (Agent 正忙，排队人数已满)"})
+
+    trace = current_trace()
+
+    async def event_source():
+        # 名额在生成器里占用：浏览器在开始推流前断开时生成器不会运行，也就不会占着名额不还
+        try:
+            await agent_pool.acquire()
+        except AgentBusyError as e:
+            print(f"⏳ 请求被拒绝: {e}")
+            yield _sse({"type": "error", "message": f"服务繁忙，请稍后再试 ({e})"})
+            return
+        try:
+            async for event in agent_executor.astream({"input": user_input, "session_id": session_id}):
+                if event["type"] == "done":
+                    event["trace_id"] = trace.trace_id
+                    if data.get("trace"):
+                        event["trace"] = trace.to_dict()
+                yield _sse(event)
+        except Exception as e:
+            print(f"❌ 报错: {e}")
+            yield _sse({"type": "error", "message": f"Agent Error: {str(e)}"})
+        finally:
+            # 无论正常结束还是浏览器中途断开，都要归还名额
+            agent_pool.release()
+            request_seconds.observe(time.perf_counter() - trace.started, "/chat/stream")
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
     uvicorn.run(app, host="localhost", port=8000)
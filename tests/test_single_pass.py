@@ -0,0 +1,78 @@
+"""
+回归测试：每个请求只遍历一次图 (user-006)。
+用脚本化的假模型统计每轮的 LLM 调用次数与经理 (supervisor) 路由调用次数，
+并检查线程状态里每轮只有一条 HumanMessage。不访问 OpenAI / 网络。
+"""
+
+import asyncio
+import os
+
+# 图在导入时会创建 ChatOpenAI，只需要占位 key；默认图用内存检查点，不在仓库里生成数据库文件
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-test")
+os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.agents.fund_manager import MultiAgentWrapper, build_app_graph
+from benchmarks.fakes import LLMStats, ScriptedChatModel, stub_analyst_tools
+
+# (用户消息, 经理 LLM 路由调用次数, 本轮 LLM 调用总数)
+TURNS = [
+    ("你好", 1, 1),                      # 闲聊：经理判断一次 -> FINISH
+    ("ETH 现在的价格是多少？", 0, 2),     # 快速路由 -> 分析师 (调用工具 + 回答) -> 快速路由 FINISH
+    ("谢谢，辛苦了", 1, 1),
+]
+
+
+class RouterCountingModel(ScriptedChatModel):
+    """额外统计 with_structured_output (经理路由) 被调用的次数"""
+
+    router_calls: int = 0
+
+    def with_structured_output(self, schema, **kwargs):
+        inner = super().with_structured_output(schema, **kwargs)
+
+        def route(prompt):
+            self.router_calls += 1
+            return inner.invoke(prompt)
+
+        async def aroute(prompt):
+            self.router_calls += 1
+            return await inner.ainvoke(prompt)
+
+        return RunnableLambda(route, afunc=aroute)
+
+
+def build():
+    model = RouterCountingModel(stats=LLMStats())
+    graph = build_app_graph(
+        model=model,
+        tools={"analyst": stub_analyst_tools(0)},
+        checkpointer=MemorySaver(),
+        answer_cache=None,
+    )
+    return MultiAgentWrapper(graph=graph), model
+
+
+def human_messages(wrapper, session_id):
+    state = wrapper.graph.get_state({"configurable": {"thread_id": session_id}})
+    return [m.content for m in state.values["messages"] if isinstance(m, HumanMessage)]
+
+
+@pytest.mark.parametrize("mode", ["invoke", "ainvoke"])
+def test_one_graph_pass_per_request(mode):
+    wrapper, model = build()
+    session_id = None
+    for turn, (message, router_calls, llm_calls) in enumerate(TURNS, start=1):
+        router_before, llm_before = model.router_calls, model.stats.calls
+        inputs = {"input": message, "session_id": session_id}
+        result = wrapper.invoke(inputs) if mode == "invoke" else asyncio.run(wrapper.ainvoke(inputs))
+        session_id = result["session_id"]
+
+        assert model.router_calls - router_before == router_calls, message
+        assert model.stats.calls - llm_before == llm_calls, message
+        # 同一条用户消息不会因为重跑图而重复写进线程
+        assert human_messages(wrapper, session_id) == [m for m, _, _ in TURNS[:turn]]